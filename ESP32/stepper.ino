@@ -5,9 +5,14 @@ const int IN3 = 26;
 const int IN4 = 25;
 
 // Tiempo entre pasos (ms). Si el motor vibra, súbelo.
+// Se usa cuando el comando no trae perfil de velocidad ("+100").
 int stepDelay = 5;
 
-// Secuencia estándar para 28BYJ-48
+// Velocidad de arranque/frenado del perfil trapezoidal (fases/s).
+// El 28BYJ-48 arranca sin perder pasos por debajo de ~200 fases/s.
+const float V_START = 150.0;
+
+// Secuencia estándar para 28BYJ-48 (paso completo, dos bobinas)
 void stepMotor(int stepIndex) {
   switch (stepIndex) {
     case 0: digitalWrite(IN1,1); digitalWrite(IN2,1); digitalWrite(IN3,0); digitalWrite(IN4,0); break;
@@ -17,23 +22,91 @@ void stepMotor(int stepIndex) {
   }
 }
 
+// Secuencia de medio paso (8 fases): mismo giro por ciclo, el doble de resolución
+void halfStepMotor(int stepIndex) {
+  switch (stepIndex) {
+    case 0: digitalWrite(IN1,1); digitalWrite(IN2,0); digitalWrite(IN3,0); digitalWrite(IN4,0); break;
+    case 1: digitalWrite(IN1,1); digitalWrite(IN2,1); digitalWrite(IN3,0); digitalWrite(IN4,0); break;
+    case 2: digitalWrite(IN1,0); digitalWrite(IN2,1); digitalWrite(IN3,0); digitalWrite(IN4,0); break;
+    case 3: digitalWrite(IN1,0); digitalWrite(IN2,1); digitalWrite(IN3,1); digitalWrite(IN4,0); break;
+    case 4: digitalWrite(IN1,0); digitalWrite(IN2,0); digitalWrite(IN3,1); digitalWrite(IN4,0); break;
+    case 5: digitalWrite(IN1,0); digitalWrite(IN2,0); digitalWrite(IN3,1); digitalWrite(IN4,1); break;
+    case 6: digitalWrite(IN1,0); digitalWrite(IN2,0); digitalWrite(IN3,0); digitalWrite(IN4,1); break;
+    case 7: digitalWrite(IN1,1); digitalWrite(IN2,0); digitalWrite(IN3,0); digitalWrite(IN4,1); break;
+  }
+}
+
+// Fase actual en unidades de medio paso (0..7, índice de halfStepMotor).
+// Se conserva entre movimientos y entre modos F/H: cada movimiento continúa
+// desde la fase en que quedó el rotor, también al invertir el sentido.
+// En paso completo se usan las fases impares (dos bobinas): stepMotor(j) == halfStepMotor(2j+1).
+int faseMedioPaso = 1;
+
+// Avanza una fase en 'sentido' (+1/-1) desde la fase actual y energiza las bobinas
+void avanzarFase(int sentido, bool medioPaso) {
+  int inc = medioPaso ? 1 : 2;
+  if (!medioPaso && (faseMedioPaso % 2) == 0) inc = 1;   // venía de medio paso: alinear a dos bobinas
+  faseMedioPaso = (faseMedioPaso + sentido * inc + 8) % 8;
+  halfStepMotor(faseMedioPaso);
+}
+
+void apagarBobinas() {
+  digitalWrite(IN1,0);
+  digitalWrite(IN2,0);
+  digitalWrite(IN3,0);
+  digitalWrite(IN4,0);
+}
+
+// Revisa si llegó "S"/"s" durante un movimiento (abortar)
+bool abortado() {
+  if (Serial.available()) {
+    char c = Serial.peek();
+    if (c == 'S' || c == 's') {
+      Serial.readStringUntil('\n');
+      return true;
+    }
+  }
+  return false;
+}
+
 void moverAdelante(int pasos) {
   for (int i = 0; i < pasos; i++) {
     for (int j = 0; j < 4; j++){
-      stepMotor(j);
+      avanzarFase(1, false);
       delay(stepDelay);
     }
     delay(stepDelay);
+    if (abortado()) return;
   }
 }
 
 void moverAtras(int pasos) {
   for (int i = 0; i < pasos; i++) {
-    for (int j = 3; j >= 0; j--){
-      stepMotor(j);
+    for (int j = 0; j < 4; j++){
+      avanzarFase(-1, false);
       delay(stepDelay);
     }
     delay(stepDelay);
+    if (abortado()) return;
+  }
+}
+
+// Movimiento con perfil trapezoidal: acelera desde V_START hasta vmax (fases/s)
+// con aceleración accel (fases/s^2) y frena simétricamente al final.
+// 'pasos' son ciclos completos de la secuencia (mismo giro que moverAdelante/moverAtras);
+// en medio paso cada ciclo son 8 fases, en paso completo son 4.
+void moverPerfil(int sentido, int pasos, bool medioPaso, float vmax, float accel) {
+  int fasesPorCiclo = medioPaso ? 8 : 4;
+  long total = (long)pasos * fasesPorCiclo;
+  if (vmax < V_START) vmax = V_START;
+  for (long i = 0; i < total; i++) {
+    // velocidad limitada por la rampa de subida, la de bajada y vmax
+    float vSubida = sqrt(V_START * V_START + 2.0 * accel * i);
+    float vBajada = sqrt(V_START * V_START + 2.0 * accel * (total - 1 - i));
+    float v = min(vmax, min(vSubida, vBajada));
+    avanzarFase(sentido, medioPaso);
+    delayMicroseconds((unsigned long)(1000000.0 / v));
+    if ((i % fasesPorCiclo) == 0 && abortado()) break;
   }
 }
 
@@ -44,7 +117,7 @@ void setup() {
   pinMode(IN3, OUTPUT);
   pinMode(IN4, OUTPUT);
 
-  Serial.println("Listo. Comandos: f100 = 100 pasos adelante, b200 = 200 pasos atrás.");
+  Serial.println("Listo. Comandos: +100 = 100 pasos adelante, -200 = 200 pasos atrás, +100,H,300,1000 = con perfil (modo F/H, fases/s, fases/s^2), S = detener.");
 }
 
 void loop() {
@@ -52,18 +125,30 @@ void loop() {
     String cmd = Serial.readStringUntil('\n');
     cmd.trim();
 
+    if (cmd.length() == 1 && (cmd.charAt(0) == 'S' || cmd.charAt(0) == 's')) {
+      apagarBobinas();
+      return;
+    }
     if (cmd.length() < 2) return;
 
     char dir = cmd.charAt(0);
-    int pasos = cmd.substring(1).toInt();
+    int coma = cmd.indexOf(',');
+    int pasos = (coma < 0 ? cmd.substring(1) : cmd.substring(1, coma)).toInt();
+
+    if (coma >= 0 && (dir == '+' || dir == '-')) {
+      // Perfil: "<dir><pasos>,<F|H>,<vmax>,<accel>"
+      int c2 = cmd.indexOf(',', coma + 1);
+      int c3 = cmd.indexOf(',', c2 + 1);
+      bool medioPaso = cmd.charAt(coma + 1) == 'H';
+      float vmax = cmd.substring(c2 + 1, c3).toFloat();
+      float accel = cmd.substring(c3 + 1).toFloat();
+      moverPerfil(dir == '+' ? 1 : -1, pasos, medioPaso, vmax, accel);
+      Serial.println("DONE");
+      return;
+    }
 
     if (dir == '+') moverAdelante(pasos);
     if (dir == '-') moverAtras(pasos);
-    if (dir == 's') {
-      digitalWrite(IN1,0);
-      digitalWrite(IN2,0);
-      digitalWrite(IN3,0);
-      digitalWrite(IN4,0);
-    }
+    if (dir == '+' || dir == '-') Serial.println("DONE");
   }
 }
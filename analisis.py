@@ -0,0 +1,461 @@
+import numpy as np           # Librería para cálculos numéricos y manejo eficiente de arreglos/matrices.
+import inspect               # Para detectar si np.fft acepta 'out=' (NumPy >= 2.0).
+
+# ---------- ANALISIS POR BLOQUE ----------
+# Una sola FFT por bloque: el espectro con ventana se calcula una vez y de él
+# se derivan la gráfica, la autocorrelación (transformada inversa de |X|^2),
+# el producto armónico (HPS, corrige errores de octava) y el nivel del micrófono.
+
+_WINDOW_CACHE = {}
+
+def hann_window(n):
+    """Ventana de Hanning de largo n (se guarda en caché, no se recalcula cada bloque)."""
+    w = _WINDOW_CACHE.get(n)
+    if w is None:
+        w = np.hanning(n)
+        _WINDOW_CACHE[n] = w
+    return w
+
+# ---------- CONTEXTO CON BUFFERS PREASIGNADOS (float32) ----------
+# NumPy >= 2.0 permite escribir la FFT en un arreglo existente (out=); en
+# versiones anteriores se copia el resultado al buffer. En ambos casos np.fft
+# usa un buffer temporal interno en cada transformada (~16 bytes por muestra
+# con relleno, por canal; ~130 KB con CHUNK=4096) que no se puede evitar sin
+# otro motor de FFT. Fuera de las dos FFT el análisis no asigna arreglos.
+_FFT_OUT = "out" in inspect.signature(np.fft.rfft).parameters
+
+PITCH_FMIN = 40.0            # Hz: retardo máximo buscado en la autocorrelación (fs / PITCH_FMIN)
+HPS_FMAX = 2000.0            # Hz: banda superior del producto armónico
+HPS_HARMONICS = 3            # espectros diezmados que se multiplican en el HPS
+HPS_MIN_CORR = 0.25          # corr[T/2] mínima (relativa al pico) para aceptar la octava superior
+CHANNEL_SWITCH_MARGIN = 0.05 # confianza que otro canal debe sacar de ventaja al actual...
+CHANNEL_SWITCH_FRAMES = 3    # ...durante tantos bloques seguidos para cambiar de canal
+
+def fast_fft_len(m):
+    """Menor largo >= m de la forma 2^a 3^b 5^c (tamaños rápidos para la FFT)."""
+    best = None
+    p5 = 1
+    while p5 < 2 * m:
+        p35 = p5
+        while p35 < 2 * m:
+            p = p35
+            while p < m:
+                p *= 2
+            if best is None or p < best:
+                best = p
+            p35 *= 3
+        p5 *= 5
+    return best
+
+def autocorr_fft_len(n, fs, fmin=PITCH_FMIN):
+    """
+    Largo de FFT mínimo para la autocorrelación lineal hasta el retardo fs/fmin:
+    basta n + retardo máximo (no 2n), redondeado a un tamaño rápido.
+    """
+    lag_max = max(1, min(n - 1, int(np.ceil(fs / fmin))))
+    return fast_fft_len(n + lag_max + 1)
+
+class AnalysisContext:
+    """
+    Análisis de bloques de audio con una única FFT directa por bloque, sobre
+    buffers float32 preasignados y operaciones in-place (argumentos out=):
+    por bloque solo asignan memoria las FFT de NumPy (buffers temporales
+    internos, ver arriba), nada se retiene entre bloques.
+
+    El espectro se calcula con relleno de ceros: la transformada inversa de
+    |X|^2 es la autocorrelación lineal (no circular), idéntica a
+    np.correlate(..., mode='full') en los retardos positivos. El pico de la
+    autocorrelación se contrasta con el producto armónico del mismo espectro
+    (HPS) para corregir errores de octava.
+
+    Con varios canales (channels > 1) los buffers son (channels, n): ventana,
+    FFT, autocorrelación y búsqueda del pico se calculan en una sola pasada a
+    lo largo del eje 1. Se elige el canal con mayor confianza (la
+    autocorrelación normalizada crece con la relación señal/ruido:
+    ~SNR/(1+SNR)), con histéresis: el canal actual se mantiene salvo que otro
+    lo supere por CHANNEL_SWITCH_MARGIN durante CHANNEL_SWITCH_FRAMES bloques
+    seguidos (o que el actual quede sin tono). Con mode='weighted' se
+    promedian los canales que coinciden con el elegido, ponderados por su SNR
+    estimada.
+
+    Uso: ctx = AnalysisContext(CHUNK, FS); ctx.analyze(audio); ctx.pitch().
+    Los arreglos retornados (magnitude, autocorr) son vistas de los buffers
+    internos y se sobrescriben en el siguiente analyze().
+
+    fft_len (por defecto 2n) es el largo con relleno de ceros. Con 2n los bins
+    pares coinciden con la FFT de n puntos de la gráfica; el análisis por lotes
+    usa autocorr_fft_len(), más corto y rápido, porque no necesita la gráfica.
+    """
+    def __init__(self, n, fs, channels=1, mode="best", fmin=PITCH_FMIN, fft_len=None):
+        self.n = n
+        self.fs = fs
+        self.channels = channels
+        self.mode = mode
+        self.fft_len = m = 2 * n if fft_len is None else fft_len
+        c = channels
+        # ventana de retardos donde se busca el pico: 0..L (frecuencias >= fmin)
+        self.lag_max = L = max(1, min(n - 1, int(np.ceil(fs / fmin))))
+        if m < n + L + 1:
+            raise ValueError("fft_len demasiado corto para la autocorrelación lineal")
+        self.window = hann_window(n).astype(np.float32)
+        self._window_energy = float(np.dot(self.window, self.window))
+        self.padded = np.zeros((c, m), dtype=np.float32)       # de n en adelante queda en cero
+        self.spectrum = np.empty((c, m // 2 + 1), dtype=np.complex64)
+        self.abs_spec = np.empty((c, m // 2 + 1), dtype=np.float32)
+        self.power = np.empty((c, m // 2 + 1), dtype=np.float32)
+        self.corr_full = np.empty((c, m), dtype=np.float32)
+        self._corr_flat = self.corr_full.reshape(-1)           # vista para np.take por fila
+        self._row_offset = np.arange(c, dtype=np.intp) * m
+        self.mag = np.empty((c, n // 2 + 1), dtype=np.float32)
+        self._lags = np.arange(L, dtype=np.intp)
+        self.diff = np.empty((c, L), dtype=np.float32)
+        self.rising = np.empty((c, L), dtype=bool)
+        self._before_start = np.empty((c, L), dtype=bool)
+        self._means = np.empty((c, 1), dtype=np.float32)
+        self._hi = np.empty(c, dtype=np.float32)
+        self._lo = np.empty(c, dtype=np.float32)
+        self._extent = np.empty(c, dtype=np.float32)
+        self._finite = np.empty(c, dtype=bool)
+        self._energy = np.empty(c, dtype=np.float32)
+        self._has_start = np.empty(c, dtype=bool)
+        self._valid = np.empty(c, dtype=bool)
+        self._invalid = np.empty(c, dtype=bool)
+        self._start = np.empty(c, dtype=np.intp)
+        self._peak = np.empty(c, dtype=np.intp)
+        self._idx = np.empty(c, dtype=np.intp)
+        self._peak_val = np.empty(c, dtype=np.float32)
+        # producto armónico en la banda fmin..HPS_FMAX (bins lo..hi del espectro con relleno)
+        self._df = fs / m
+        self._hps_lo = max(1, int(fmin / self._df))
+        self._hps_hi = min((m // 2 + 1) // HPS_HARMONICS, int(HPS_FMAX / self._df) + 1)
+        # bloques muy cortos no tienen bins en la banda: sin corrección de octava
+        self._hps_on = self._hps_hi > self._hps_lo
+        self.hps = np.empty((c, max(0, self._hps_hi - self._hps_lo)), dtype=np.float32)
+        self._hps_bin = np.empty(c, dtype=np.intp)
+        self._f_hps = np.empty(c)
+        self._f_alt = np.empty(c)
+        self._tol = np.empty(c)
+        self._half = np.empty(c, dtype=np.intp)
+        self._half_idx = np.empty((c, 3), dtype=np.intp)
+        self._half_vals = np.empty((c, 3), dtype=np.float32)
+        self._half_k = np.empty(c, dtype=np.intp)
+        self._half_val = np.empty(c, dtype=np.float32)
+        self._thr = np.empty(c, dtype=np.float32)
+        self._corr_ok = np.empty(c, dtype=bool)
+        self._octave = np.empty(c, dtype=bool)
+        self._offsets3 = np.arange(-1, 2, dtype=np.intp)
+        self.silent = np.ones(c, dtype=bool)
+        self.freqs = np.zeros(c)          # frecuencia por canal (0.0 = sin tono)
+        self.confs = np.zeros(c)          # confianza por canal
+        self.channel = 0                  # canal elegido en el último bloque
+        self._channel_set = False         # el primer bloque elige el mejor sin histéresis
+        self._switch_frames = 0           # bloques seguidos en que otro canal supera al actual
+        self.freq = 0.0
+        self.conf = 0.0
+
+    def analyze(self, data):
+        """Procesa un bloque de n muestras: (n,) o (n, channels) como entrega sounddevice. Retorna self."""
+        np.copyto(self.padded[:, :self.n], np.reshape(data, (self.n, -1)).T, casting='same_kind')
+        self._run(self.channels)
+        self._select_channel()
+        return self
+
+    def analyze_rows(self, frames):
+        """
+        Analiza un arreglo 2-D (rows, n) de bloques independientes (rows <= channels),
+        sin elegir canal. Retorna vistas (freqs, confs) de largo rows.
+        """
+        rows = len(frames)
+        np.copyto(self.padded[:rows, :self.n], frames, casting='same_kind')
+        self._run(rows)
+        return self.freqs[:rows], self.confs[:rows]
+
+    def _run(self, rows):
+        """Ventana, FFT, autocorrelación y pico de las primeras 'rows' filas de self.padded."""
+        n = self.n
+        x = self.padded[:rows, :n]
+        x.max(axis=1, out=self._hi[:rows])
+        x.min(axis=1, out=self._lo[:rows])
+        # max/min propagan NaN/inf: solo en ese caso (raro) se limpia el bloque
+        np.add(self._hi[:rows], self._lo[:rows], out=self._extent[:rows])
+        np.isfinite(self._extent[:rows], out=self._finite[:rows])
+        if not self._finite[:rows].all():
+            np.nan_to_num(x, copy=False)
+            x.max(axis=1, out=self._hi[:rows])
+            x.min(axis=1, out=self._lo[:rows])
+        np.negative(self._lo[:rows], out=self._lo[:rows])
+        np.maximum(self._hi[:rows], self._lo[:rows], out=self._hi[:rows])
+        np.less_equal(self._hi[:rows], 1e-8, out=self.silent[:rows])
+        x.mean(axis=1, keepdims=True, out=self._means[:rows])
+        np.subtract(x, self._means[:rows], out=x)
+        np.multiply(x, self.window, out=x)
+        spectrum = self.spectrum[:rows]
+        if _FFT_OUT:
+            np.fft.rfft(self.padded[:rows], axis=1, out=spectrum)
+        else:
+            spectrum[...] = np.fft.rfft(self.padded[:rows], axis=1)
+        np.abs(spectrum, out=self.abs_spec[:rows])
+        np.multiply(self.abs_spec[:rows], self.abs_spec[:rows], out=self.power[:rows])
+        if _FFT_OUT:
+            np.fft.irfft(self.power[:rows], n=self.fft_len, axis=1, out=self.corr_full[:rows])
+        else:
+            self.corr_full[:rows] = np.fft.irfft(self.power[:rows], n=self.fft_len, axis=1)
+        self._pick_peaks(rows)
+
+    def _pick_peaks(self, rows):
+        """
+        Pico de la autocorrelación para todas las filas a la vez: primer retardo
+        donde la curva empieza a subir y máximo desde ahí hasta lag_max. Los
+        retardos previos al ascenso se marcan -inf en el mismo buffer (sin copiar
+        la autocorrelación); corr[0] se guarda antes como energía del bloque.
+        """
+        L = self.lag_max
+        corr = self.corr_full[:rows]
+        energy = self._energy[:rows]
+        start = self._start[:rows]
+        peak = self._peak[:rows]
+        valid = self._valid[:rows]
+        np.copyto(energy, corr[:, 0])
+        np.subtract(corr[:, 1:L + 1], corr[:, :L], out=self.diff[:rows])
+        np.greater(self.diff[:rows], 0, out=self.rising[:rows])
+        self.rising[:rows].any(axis=1, out=self._has_start[:rows])
+        self.rising[:rows].argmax(axis=1, out=start)
+        np.less(self._lags, start[:, None], out=self._before_start[:rows])
+        np.copyto(corr[:, :L], -np.inf, where=self._before_start[:rows])
+        corr[:, :L + 1].argmax(axis=1, out=peak)
+        np.add(self._row_offset[:rows], peak, out=self._idx[:rows])
+        np.take(self._corr_flat, self._idx[:rows], out=self._peak_val[:rows], mode='clip')
+        if self._hps_on:
+            self._octave_check(rows)
+        # válido: hay ascenso, no es silencio, pico > 0 y energía positiva
+        np.logical_not(self.silent[:rows], out=valid)
+        np.logical_and(valid, self._has_start[:rows], out=valid)
+        np.greater(peak, 0, out=self._invalid[:rows])
+        np.logical_and(valid, self._invalid[:rows], out=valid)
+        np.greater(energy, 0, out=self._invalid[:rows])
+        np.logical_and(valid, self._invalid[:rows], out=valid)
+        np.logical_not(valid, out=self._invalid[:rows])
+        np.divide(self.fs, peak, out=self.freqs[:rows], where=valid)
+        np.divide(self._peak_val[:rows], energy, out=self.confs[:rows], where=valid)
+        np.copyto(self.freqs[:rows], 0.0, where=self._invalid[:rows])
+        np.copyto(self.confs[:rows], 0.0, where=self._invalid[:rows])
+
+    def _octave_check(self, rows):
+        """
+        Corrige errores de octava (el pico cae en 2T, la mitad de la frecuencia):
+        si el HPS del espectro está en fs/(peak/2) y la autocorrelación en peak/2
+        también es alta, se toma el retardo mitad (máximo local en +-1 muestra).
+        """
+        lo, hi = self._hps_lo, self._hps_hi
+        spec = self.abs_spec[:rows]
+        hps = self.hps[:rows]
+        np.copyto(hps, spec[:, lo:hi])
+        for h in range(2, HPS_HARMONICS + 1):
+            np.multiply(hps, spec[:, lo * h:hi * h:h], out=hps)
+        hps.argmax(axis=1, out=self._hps_bin[:rows])
+        np.add(self._hps_bin[:rows], lo, out=self._hps_bin[:rows])
+        np.multiply(self._hps_bin[:rows], self._df, out=self._f_hps[:rows])
+
+        peak = self._peak[:rows]
+        half = self._half[:rows]
+        np.add(peak, 1, out=half)
+        np.floor_divide(half, 2, out=half)
+        np.maximum(half, 2, out=half)
+        idx = self._half_idx[:rows]
+        np.add(self._row_offset[:rows, None], half[:, None], out=idx)
+        np.add(idx, self._offsets3, out=idx)
+        np.take(self._corr_flat, idx, out=self._half_vals[:rows], mode='clip')
+        self._half_vals[:rows].argmax(axis=1, out=self._half_k[:rows])
+        self._half_vals[:rows].max(axis=1, out=self._half_val[:rows])
+        np.add(half, self._half_k[:rows], out=half)
+        np.subtract(half, 1, out=half)
+
+        # |fs/half - f_hps| <= max(3 %, 1.5 bins) y corr[half] >= HPS_MIN_CORR * corr[peak]
+        f_alt, tol, octave = self._f_alt[:rows], self._tol[:rows], self._octave[:rows]
+        np.divide(self.fs, half, out=f_alt)
+        np.multiply(f_alt, 0.03, out=tol)
+        np.maximum(tol, 1.5 * self._df, out=tol)
+        np.subtract(f_alt, self._f_hps[:rows], out=f_alt)
+        np.abs(f_alt, out=f_alt)
+        np.less_equal(f_alt, tol, out=octave)
+        thr, ok = self._thr[:rows], self._corr_ok[:rows]
+        np.multiply(self._peak_val[:rows], HPS_MIN_CORR, out=thr)
+        np.greater_equal(self._half_val[:rows], thr, out=ok)
+        np.logical_and(octave, ok, out=octave)
+        np.greater(self._half_val[:rows], 0, out=ok)
+        np.logical_and(octave, ok, out=octave)
+        np.copyto(peak, half, where=octave)
+        np.copyto(self._peak_val[:rows], self._half_val[:rows], where=octave)
+
+    def _select_channel(self):
+        best = int(self.confs.argmax())
+        cur = self.channel
+        if not self._channel_set or self.confs[cur] <= 0 < self.confs[best]:
+            self._switch_frames = 0               # primer bloque o canal actual sin tono
+        elif best == cur or self.confs[best] - self.confs[cur] < CHANNEL_SWITCH_MARGIN:
+            self._switch_frames = 0
+            best = cur
+        else:
+            self._switch_frames += 1
+            if self._switch_frames < CHANNEL_SWITCH_FRAMES:
+                best = cur
+            else:
+                self._switch_frames = 0
+        self._channel_set = True
+        self.channel = best
+        self.freq = float(self.freqs[best])
+        self.conf = float(self.confs[best])
+        if self.mode != "weighted" or self.channels == 1 or self.freq <= 0:
+            return
+        # promedio ponderado por SNR (conf/(1-conf)) de los canales a menos de 50 cents del mejor
+        num = den = 0.0
+        for c in range(self.channels):
+            f, r = self.freqs[c], min(self.confs[c], 0.999)
+            if f <= 0 or abs(1200 * np.log2(f / self.freq)) > 50:
+                continue
+            w = r / (1 - r)
+            num += w * f
+            den += w
+        if den > 0:
+            self.freq = num / den
+
+    def magnitude(self):
+        """Magnitud normalizada del canal elegido en la rejilla de rfftfreq(n, 1/fs) (vista del buffer)."""
+        if self.fft_len != 2 * self.n:
+            raise ValueError("magnitude() requiere fft_len = 2n")
+        ch = self.channel
+        np.divide(self.abs_spec[ch, ::2], self.n, out=self.mag[ch])
+        return self.mag[ch]
+
+    def autocorr(self):
+        """
+        Autocorrelación del canal elegido en retardos 0..n-1 (vista del buffer).
+        Los retardos previos al primer ascenso quedan en -inf tras la búsqueda del pico.
+        """
+        return self.corr_full[self.channel, :self.n]
+
+    def pitch(self):
+        """Frecuencia fundamental por autocorrelación (0.0 si no hay tono)."""
+        return self.freq
+
+    def pitch_with_confidence(self):
+        """Retorna (freq, confianza) del canal elegido (o de la combinación ponderada)."""
+        return self.freq, self.conf
+
+    def rms(self):
+        """Nivel RMS del canal elegido a partir de corr[0] (Parseval)."""
+        if self.silent[self.channel]:
+            return 0.0
+        return float(np.sqrt(max(float(self._energy[self.channel]), 0.0) / self._window_energy))
+
+# ---------- ESPECTROGRAMA (CASCADA) ----------
+class SpectrogramRing:
+    """
+    Historial de espectros (dB) en un buffer circular preasignado de
+    (n_bins, 2*n_cols): cada columna se escribe dos veces (pos y pos+n_cols),
+    así view() siempre es un bloque contiguo en el tiempo sin rotar (np.roll).
+    Ojo: matplotlib copia el arreglo en AxesImage.set_data, así que mostrarlo
+    cuesta igual O(n_bins*n_cols) por bloque; el buffer doble solo evita una
+    segunda copia completa y mantiene la memoria fija.
+    """
+    def __init__(self, n_bins, n_cols, floor_db=-120.0):
+        self.n_bins = n_bins
+        self.n_cols = n_cols
+        self.floor_db = floor_db
+        self.buf = np.full((n_bins, 2 * n_cols), floor_db, dtype=np.float32)
+        self._col = np.empty(n_bins, dtype=np.float32)
+        self.pos = 0
+
+    def push(self, mag):
+        """Agrega una columna (magnitudes lineales de n_bins) en escala dB. Retorna la columna."""
+        np.maximum(mag, 10 ** (self.floor_db / 20), out=self._col)
+        np.log10(self._col, out=self._col)
+        self._col *= 20
+        self.buf[:, self.pos] = self._col
+        self.buf[:, self.pos + self.n_cols] = self._col
+        self.pos = (self.pos + 1) % self.n_cols
+        return self._col
+
+    def view(self):
+        """Columnas de la más antigua a la más reciente (vista, sin copia)."""
+        return self.buf[:, self.pos:self.pos + self.n_cols]
+
+    def clear(self):
+        self.buf.fill(self.floor_db)
+        self.pos = 0
+
+# ---------- ANALISIS POR LOTES (offline / benchmark) ----------
+def frame_signal(x, frame_len, hop):
+    """
+    Divide una señal 1-D larga en bloques (n_frames, frame_len) como vista con
+    strides: no copia datos. La vista es de solo lectura.
+    """
+    x = np.ascontiguousarray(x)
+    if x.ndim != 1:
+        raise ValueError("frame_signal espera una señal 1-D")
+    if hop <= 0 or frame_len <= 0:
+        raise ValueError("frame_len y hop deben ser positivos")
+    if len(x) < frame_len:
+        return np.empty((0, frame_len), dtype=x.dtype)
+    n_frames = 1 + (len(x) - frame_len) // hop
+    step = x.strides[0]
+    return np.lib.stride_tricks.as_strided(
+        x, shape=(n_frames, frame_len), strides=(hop * step, step), writeable=False
+    )
+
+def cents_to_nearest(freq, a4=440.0):
+    """Cents respecto a la nota temperada más cercana (vectorizado, NaN si freq <= 0)."""
+    freq = np.asarray(freq, dtype=float)
+    out = np.full(freq.shape, np.nan)
+    ok = freq > 0
+    n = 12 * np.log2(freq[ok] / a4)
+    out[ok] = 100 * (n - np.round(n))
+    return out
+
+def analyze_frames(frames, fs, target_freq=None, a4=440.0, ctx=None):
+    """
+    Estima la frecuencia de todos los bloques de un arreglo 2-D (n_frames, N)
+    en una sola pasada vectorizada, con el mismo AnalysisContext (float32) que
+    usa la interfaz: una FFT a lo largo del eje 1 y búsqueda del pico en todas
+    las filas a la vez. 'ctx' permite reutilizar los buffers entre llamadas.
+
+    Retorna (freq, cents, confianza), arreglos de largo n_frames. Los cents se
+    miden contra target_freq si se entrega, o contra la nota más cercana.
+    """
+    frames = np.asarray(frames)
+    n_frames, n = frames.shape
+    if n_frames == 0 or n < 2:
+        return np.zeros(n_frames), np.full(n_frames, np.nan), np.zeros(n_frames)
+    if ctx is None or ctx.n != n or ctx.fs != fs or ctx.channels < n_frames:
+        ctx = AnalysisContext(n, fs, channels=n_frames, fft_len=autocorr_fft_len(n, fs))
+    f, c = ctx.analyze_rows(frames)
+    freq, conf = f.copy(), c.copy()
+    if target_freq is None:
+        cents = cents_to_nearest(freq, a4)
+    else:
+        cents = np.full(n_frames, np.nan)
+        ok = freq > 0
+        cents[ok] = 1200 * np.log2(freq[ok] / target_freq)
+    return freq, cents, conf
+
+def analyze_signal(x, fs, frame_len=4096, hop=None, target_freq=None, a4=440.0, chunk_frames=64):
+    """
+    Análisis por lotes de una señal larga: la divide en bloques (vista sin
+    copia) y los procesa de a chunk_frames por vez con un único contexto de
+    buffers preasignados, de modo que la memoria es fija y escala a millones
+    de bloques.
+
+    Retorna (freq, cents, confianza) con un valor por bloque.
+    """
+    hop = frame_len if hop is None else hop
+    frames = frame_signal(np.asarray(x), frame_len, hop)
+    n_frames = len(frames)
+    freq = np.zeros(n_frames)
+    cents = np.full(n_frames, np.nan)
+    conf = np.zeros(n_frames)
+    ctx = AnalysisContext(frame_len, fs, channels=min(chunk_frames, max(n_frames, 1)),
+                          fft_len=autocorr_fft_len(frame_len, fs))
+    for i in range(0, n_frames, chunk_frames):
+        j = min(i + chunk_frames, n_frames)
+        freq[i:j], cents[i:j], conf[i:j] = analyze_frames(frames[i:j], fs, target_freq, a4, ctx)
+    return freq, cents, conf
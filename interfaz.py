@@ -9,14 +9,20 @@ import threading
 import time
 from PIL import Image, ImageTk
 import os
-from microfono import probar_nivel_microfono
 
 # Importa todos los parámetros globales necesarios desde main.py
 from main import (
     SMOOTH_N, FS, CHUNK, UPDATE_MS, GREEN_CENTS, ORANGE_CENTS, STABLE_MS_REQUIRED,
     STABLE_CENTS_THRESHOLD, A4_FREQ, GUITAR_STRINGS, freq_to_note_name, cents_difference,
-    get_freq_autocorr, find_esp32_port, open_serial, MotorController
+    find_esp32_port, open_serial, MotorController, TuningController, identify_string,
+    TRACKER_MAX_STD_CENTS, WATERFALL_SECONDS, WATERFALL_FMIN, WATERFALL_FMAX,
+    CHANNEL_MODE, input_channels
 )
+from analisis import AnalysisContext, SpectrogramRing
+from seguimiento import PitchTracker
+
+# Modo que identifica la cuerda tocada y avanza solo por todas las cuerdas
+SESSION_MODE = "Sesión guitarra"
 
 class TunerApp:
     def __init__(self, root):
@@ -37,6 +43,11 @@ class TunerApp:
         self.device_index = None
         self.device_map = {}
         self.history = deque(maxlen=SMOOTH_N)
+        # Tras cada movimiento el historial se reinicia: solo se promedian bloques
+        # capturados después de _fresh_since (ver _read_cents_after_move)
+        self._fresh_since = 0.0
+        self._history_since = 0.0
+        self._fresh = 0
         self.mode_var = tk.StringVar(value="Normal")
         self.string_var = tk.StringVar()
         self.completed_strings = set()
@@ -46,14 +57,43 @@ class TunerApp:
         self.motor_enabled_var = tk.BooleanVar(value=True)
 
         self.freq_axis = np.fft.rfftfreq(CHUNK, 1/FS)
+        # Buffers float32 preasignados para la captura y el análisis de cada bloque
+        # (se rehacen en start() según los canales del dispositivo elegido)
+        self.rec_buffer = np.zeros((CHUNK, 1), dtype=np.float32)
+        self.analysis_ctx = AnalysisContext(CHUNK, FS)
         self.fft_data = np.zeros(len(self.freq_axis))
 
+        # Cascada: banda WATERFALL_FMIN..FMAX, una columna por bloque. El número de
+        # columnas sale del periodo nominal (CHUNK/FS + UPDATE_MS); el eje de tiempo
+        # usa el periodo medido entre bloques (análisis y dibujo también tardan)
+        self._wf_lo = int(np.searchsorted(self.freq_axis, WATERFALL_FMIN))
+        self._wf_hi = int(np.searchsorted(self.freq_axis, WATERFALL_FMAX))
+        self._frame_nominal_s = CHUNK / FS + UPDATE_MS / 1000.0
+        self._frame_s = self._frame_nominal_s   # periodo medido (promedio exponencial)
+        self._last_captured = None
+        self.waterfall = SpectrogramRing(self._wf_hi - self._wf_lo,
+                                         max(2, int(WATERFALL_SECONDS / self._frame_nominal_s)))
+        self._wf_top = -40.0   # nivel superior de la escala de colores (dB), se ajusta lentamente
+
         self.motor = None
         self.ser = None
 
         self._stable_candidate_freq = None
         self._stable_since = None
 
+        # Estimación continua de los cents (audio + trayectoria del motor)
+        self.tracker = PitchTracker()
+        self._tracker_string = None
+
+        # Modo sesión: cuerda identificada y tiempos por cuerda / total
+        self.active_string = None
+        self._session_string = None
+        self._session_start = None
+        self._session_end = None
+        self._string_started = {}
+        self.session_times = {}
+        self._saved_guitar_state = None   # (cuerdas completadas, cuerda elegida) de antes de la sesión
+
         # --- CARGA DE ICONOS PARA BOTONES ---
         self.icon_play = None
         self.icon_stop = None
@@ -103,9 +143,6 @@ class TunerApp:
 
         self._esta_iniciando = False
 
-        self.nivel_thread = None
-        self.nivel_stop = None
-
         # --- BOTÓN TOGGLE INICIAR/DETENER (icono PNG) ---
         # self.boton_toggle = tk.Button(root, image=self.img_tocar, command=self.toggle_iniciar_detener)
         # self.boton_toggle.image = self.img_tocar
@@ -134,32 +171,14 @@ class TunerApp:
         self.boton_toggle.config(state="disabled")
         self.start()
         self.boton_toggle.config(state="normal")
-        # Inicia la barra de nivel del micrófono SOLO si no hay un hilo corriendo
-        try:
-            if self.nivel_thread is None or not self.nivel_thread.is_alive():
-                indice_microfono = self.device_index if self.device_index is not None else 0
-                self.nivel_thread, self.nivel_stop = probar_nivel_microfono(indice_microfono, self.barra_nivel, self.nivel_var)
-        except Exception as e:
-            self.nivel_var.set(f"Error: {e}")
+        # La barra de nivel se alimenta desde update_loop (mismo bloque de audio que la FFT)
 
     def detener(self):
         """Detiene el afinador y la barra de nivel del micrófono."""
         self.boton_toggle.config(state="disabled")
         self.stop()
         self.boton_toggle.config(state="normal")
-        # Detiene y limpia la barra de nivel del micrófono
-        try:
-            if self.nivel_stop is not None:
-                self.nivel_stop.set()
-            if self.nivel_thread is not None and self.nivel_thread.is_alive():
-                self.nivel_thread.join(timeout=1)
-        except Exception:
-            pass
-        self.nivel_thread = None
-        self.nivel_stop = None
-        self.barra_nivel['value'] = 0
-        self.nivel_var.set("Nivel: 0")
-        # ...ya se limpia el gráfico y notas en stop()...
+        # ...la barra de nivel, el gráfico y las notas ya se limpian en stop()...
 
     def configuracion_avanzada(self):
         self.open_advanced_options()
@@ -180,7 +199,7 @@ class TunerApp:
         self.device_combo = ttk.Combobox(top, state='readonly', width=60)
         self.device_combo.grid(row=0, column=1, padx=6)
         ttk.Label(top, text="Modo:").grid(row=0, column=2, sticky='e', padx=(10,0))
-        mode_combo = ttk.Combobox(top, state='readonly', values=["Normal", "Afinador guitarra"], textvariable=self.mode_var, width=20)
+        mode_combo = ttk.Combobox(top, state='readonly', values=["Normal", "Afinador guitarra", SESSION_MODE], textvariable=self.mode_var, width=20)
         mode_combo.grid(row=0, column=3, padx=6)
         mode_combo.bind("<<ComboboxSelected>>", self.on_mode_change)
 
@@ -256,16 +275,28 @@ class TunerApp:
         ttk.Label(details, textvariable=self.cents_var).grid(row=0, column=1, padx=6)
         ttk.Label(details, text="Completadas:").grid(row=0, column=2, padx=(20,2))
         ttk.Label(details, textvariable=self.completed_label_var).grid(row=0, column=3, padx=2)
+        self.session_var = tk.StringVar(value="")
+        ttk.Label(details, textvariable=self.session_var).grid(row=1, column=0, columnspan=4, sticky='w', padx=6)
 
         # 3) Gráfica (self.canvas)
-        fig = Figure(figsize=(7,3))
-        self.ax = fig.add_subplot(111)
+        fig = Figure(figsize=(7,5))
+        self.ax = fig.add_subplot(211)
         self.ax.set_xlabel("Frecuencia [Hz]")
         self.ax.set_ylabel("Magnitud")
         self.ax.set_title("FFT (60-2000 Hz)")
         self.line, = self.ax.plot(self.freq_axis, self.fft_data)
         self.ax.set_xlim(60, 2000)
         self.ax.set_ylim(0, 1e-6)
+        # Cascada: una sola imagen que se actualiza en su lugar (set_data) cada bloque
+        self.ax_wf = fig.add_subplot(212)
+        self.ax_wf.set_xlabel("Tiempo [s]")
+        self.ax_wf.set_ylabel("Frecuencia [Hz]")
+        self.waterfall_img = self.ax_wf.imshow(
+            self.waterfall.view(), origin='lower', aspect='auto', interpolation='nearest',
+            extent=[-self.waterfall.n_cols * self._frame_s, 0,
+                    self.freq_axis[self._wf_lo], self.freq_axis[self._wf_hi - 1]],
+            vmin=self._wf_top - 60, vmax=self._wf_top, cmap='magma'
+        )
         self.canvas = FigureCanvasTkAgg(fig, master=self.root)
         self.canvas.get_tk_widget().pack(fill='both', expand=True, padx=6, pady=6)
         fig.tight_layout()
@@ -313,7 +344,27 @@ class TunerApp:
         if self.mode_var.get() == "Afinador guitarra":
             self.string_combo.config(state='readonly')
         else:
+            # en modo sesión la cuerda se identifica sola
             self.string_combo.config(state='disabled')
+        session = self.mode_var.get() == SESSION_MODE
+        if session and self._saved_guitar_state is None:
+            # la sesión empieza de cero: se guarda el estado del modo guitarra y se restaura al salir
+            self._saved_guitar_state = (set(self.completed_strings), self.string_var.get())
+            self._switch_tuning_state(set(), self.string_var.get())
+        elif not session and self._saved_guitar_state is not None:
+            completed, string = self._saved_guitar_state
+            self._saved_guitar_state = None
+            self._switch_tuning_state(completed, string)
+
+    def _switch_tuning_state(self, completed, string):
+        """Reemplaza cuerdas completadas y cuerda elegida, y reinicia sesión e historial."""
+        self.completed_strings.clear()
+        self.completed_strings.update(completed)
+        self.string_var.set(string)
+        self.history.clear()
+        self._stable_candidate_freq = None
+        self.update_completed_label()
+        self.reset_session()
 
     def toggle_start_stop(self):
         if not self.running:
@@ -343,17 +394,14 @@ class TunerApp:
         except Exception:
             messagebox.showerror("Error", "Selecciona un dispositivo válido")
             return
+        channels = input_channels(self.device_index)
+        if channels != self.rec_buffer.shape[1]:
+            self.rec_buffer = np.zeros((CHUNK, channels), dtype=np.float32)
+            self.analysis_ctx = AnalysisContext(CHUNK, FS, channels, CHANNEL_MODE)
         if self.motor_enabled_var.get() and not self.motor:
             self.try_open_serial()
         self.running = True
         self.root.after(10, self.update_loop)
-        # Inicia la barra de nivel del micrófono si no está corriendo
-        try:
-            if self.nivel_thread is None or not self.nivel_thread.is_alive():
-                indice_microfono = self.device_index if self.device_index is not None else 0
-                self.nivel_thread, self.nivel_stop = probar_nivel_microfono(indice_microfono, self.barra_nivel, self.nivel_var)
-        except Exception as e:
-            self.nivel_var.set(f"Error: {e}")
 
     def stop(self):
         """Detiene la adquisición de audio y limpia la interfaz."""
@@ -364,103 +412,164 @@ class TunerApp:
         self.fft_data = np.zeros(len(self.freq_axis))
         self.line.set_ydata(self.fft_data)
         self.ax.set_ylim(0, 1e-6)
+        self.waterfall.clear()
+        self.waterfall_img.set_data(self.waterfall.view())
+        self._last_captured = None   # la pausa no cuenta como periodo entre bloques
         self.canvas.draw_idle()
         self.note_label.config(text="—", fg="black")
         self.freq_var.set("Freq: - Hz")
         self.cents_var.set("Cents: -")
-        # Detiene y limpia la barra de nivel del micrófono
-        try:
-            if self.nivel_stop is not None:
-                self.nivel_stop.set()
-            if self.nivel_thread is not None and self.nivel_thread.is_alive():
-                self.nivel_thread.join(timeout=1)
-        except Exception:
-            pass
-        self.nivel_thread = None
-        self.nivel_stop = None
+        # Limpia la barra de nivel del micrófono
         self.barra_nivel['value'] = 0
         self.nivel_var.set("Nivel: 0")
 
     def reset_completed(self):
         self.completed_strings.clear()
         self.update_completed_label()
+        self.reset_session()
+
+    def reset_session(self):
+        """Reinicia la sesión: cuerda identificada y tiempos."""
+        self._session_string = None
+        self._session_start = None
+        self._session_end = None
+        self._string_started = {}
+        self.session_times = {}
+        self.update_session_label()
+
+    def _next_incomplete_string(self):
+        for k in GUITAR_STRINGS.keys():
+            if k not in self.completed_strings:
+                return k
+        return None
+
+    def _session_update(self, freq):
+        """
+        Identifica la cuerda tocada a partir de 'freq' (con histéresis) y la
+        selecciona. Al cambiar de cuerda se limpia el historial para no promediar
+        dos cuerdas. Retorna False si no se reconoce ninguna cuerda.
+        """
+        ident = identify_string(freq, self._session_string)
+        if ident is None:
+            return False
+        if ident != self._session_string:
+            self._session_string = ident
+            self.history.clear()
+            self._stable_candidate_freq = None
+            self.string_var.set(ident)
+            now = time.time()
+            if self._session_start is None:
+                self._session_start = now
+            if ident not in self.completed_strings:
+                self._string_started.setdefault(ident, now)
+        return True
+
+    def _tuning_active(self):
+        return hasattr(self, "_tuning_thread") and self._tuning_thread.is_alive()
+
+    def _mark_completed(self, sel_string):
+        """
+        Marca la cuerda como afinada; en modo sesión guarda su tiempo y avanza a la siguiente.
+        Mientras el afinado automático está en curso no se marca: una lectura
+        verde pasajera (p. ej. con el motor cruzando el objetivo) no la completa.
+        """
+        if sel_string in self.completed_strings or self._tuning_active():
+            return
+        self.completed_strings.add(sel_string)
+        self.update_completed_label()
+        if self.mode_var.get() == SESSION_MODE:
+            started = self._string_started.get(sel_string)
+            if started is not None:
+                self.session_times[sel_string] = time.time() - started
+            nxt = self._next_incomplete_string()
+            if nxt is not None:
+                self.string_var.set(nxt)
+            else:
+                self._session_end = time.time()
+            self.update_session_label()
+
+    def update_session_label(self):
+        if self._session_start is None:
+            self.session_var.set("")
+            return
+        parts = [f"{k}: {t:.1f} s" for k, t in self.session_times.items()]
+        nxt = self._next_incomplete_string()
+        if nxt is None:
+            end = self._session_end or time.time()
+            parts.append(f"Total: {end - self._session_start:.1f} s (sesión completa)")
+        else:
+            parts.append(f"Total: {time.time() - self._session_start:.1f} s")
+            parts.insert(0, f"Siguiente: {nxt}")
+        self.session_var.set(" | ".join(parts))
 
     def update_completed_label(self):
         remaining = [k for k in GUITAR_STRINGS.keys() if k not in self.completed_strings]
         self.completed_label_var.set(", ".join(remaining) if remaining else "Todas completadas")
 
-    def _move_and_wait(self, direction_sign, steps):
-        if not self.motor:
+    def _tracker_says_stop(self, start_cents):
+        """
+        True si, con el motor aún girando, el seguidor estima que detenerlo ahora
+        lo deja en la zona verde, o que seguir lo pasaría del objetivo más allá
+        de la incertidumbre. Se compara lo que falta hasta el objetivo con lo que
+        el motor recorre mientras la detención llega al firmware
+        (MotorController.stopping_steps), así se detiene antes de cruzar.
+        """
+        now = time.time()
+        cps = self._cents_per_step()
+        est, sd = self.tracker.estimate(now, self.motor.position_at(now), cps)
+        if est is None:
             return False
-        timeout = float(self.step_timeout_var.get())
-        ok = self.motor.send_move(direction_sign, steps, timeout=timeout)
-        return ok
+        # cents que faltan hasta el objetivo en el sentido del movimiento al detenerse
+        remaining = -est if start_cents < 0 else est
+        landing = remaining - self.motor.stopping_steps(now) * cps
+        if abs(landing) <= GREEN_CENTS and sd <= GREEN_CENTS:
+            return True
+        return landing < -sd
+
+    def _cents_per_step(self):
+        try:
+            return float(self.cents_per_step_var.get()) or 1.0
+        except (tk.TclError, ValueError):
+            return 1.0
 
-    def iterative_tune(self, initial_cents, initial_sign):
+    def _read_cents_after_move(self):
         """
-        Algoritmo iterativo con reducción de pasos por overshoot:
-         - initial_n = max_steps (parámetro)
-         - steps a mover inicialmente = min(initial_n, rounding(initial_cents / cents_per_step)) o initial_n si esto da 0
-         - si overshoot -> reverse y reducir pasos según n / (m^2) (m = número de overshoots/iteraciones)
-         - detener cuando abs(cents) <= GREEN_CENTS
+        Lectura posterior al movimiento: se reinicia el historial y se esperan
+        SMOOTH_N bloques capturados después de que el motor se detuvo. Antes, si
+        el seguidor ya se corrigió con un bloque capturado entero después de
+        detenerse y tiene poca incertidumbre, se usa su estimación (proyectada a
+        este instante con la posición del motor).
         """
+        since = time.time()
+        self._fresh_since = since
+        timeout = 2 * SMOOTH_N * (CHUNK / FS + UPDATE_MS / 1000.0)
+        while time.time() - since < timeout:
+            last = self.tracker.last_update
+            if last is not None and last - CHUNK / (2 * FS) >= since:
+                now = time.time()
+                est, sd = self.tracker.estimate(now, self.motor.position_at(now), self._cents_per_step())
+                if est is not None and sd <= TRACKER_MAX_STD_CENTS:
+                    return est
+            if self._history_since == since and self._fresh >= SMOOTH_N:
+                return self.latest_cents
+            time.sleep(0.05)
+        return None
+
+    def iterative_tune(self, initial_cents, initial_sign):
+        """Afinado iterativo (ver main.TuningController) con los parámetros de la interfaz."""
         if not self.motor or not self.motor_enabled_var.get():
             return
-
-        cents_per_step = float(self.cents_per_step_var.get()) or 1.0
-        initial_n = int(self.max_steps_var.get()) or 1
-        max_iterations = 10
-
-        prev_cents = initial_cents
-        # tracking overshoots/reducciones
-        iteration = 0
-
-        for it in range(max_iterations):
-            iteration += 1
-            # calcular pasos sugeridos en base a prev_cents, pero no más que initial_n
-            suggested = int(round(abs(prev_cents) / cents_per_step)) if cents_per_step > 0 else initial_n
-            if suggested <= 0:
-                steps = initial_n
-            else:
-                steps = min(initial_n, suggested)
-
-            # si estamos en iteraciones posteriores y hubo overshoot, reducir según n/(iteration^2)
-            if iteration > 1:
-                reduced = max(1, int(round(initial_n / (iteration ** 2))))
-                steps = min(steps, reduced)
-
-            if steps <= 0:
-                break
-
-            direction = '+' if prev_cents < 0 else '-'
-
-            ok = self._move_and_wait(direction, steps)
-            if not ok:
-                break  # <--- Corrige la indentación aquí
-
-            # esperar a que update_loop publique latest_cents
-            t0 = time.time()
-            new_cents = getattr(self, "latest_cents", None)
-            while new_cents is None and time.time() - t0 < 1.0:
-                time.sleep(0.05)
-                new_cents = getattr(self, "latest_cents", None)
-            if new_cents is None:
-                break
-
-            # si sign flipped -> overshoot: revert parcialmente y contar iteración (ya se incrementó)
-            if (prev_cents < 0 and new_cents > 0) or (prev_cents > 0 and new_cents < 0):
-                # revert using reduced steps (n/(iteration^2)), al menos 1 paso
-                reverse_steps = max(1, int(round(initial_n / (iteration ** 2))))
-                rev_dir = '-' if direction == '+' else '+'
-                self._move_and_wait(rev_dir, reverse_steps)
-                time.sleep(0.08)
-
-            # si ya afinada -> salir
-            if abs(new_cents) <= GREEN_CENTS:
-                break
-
-            # actualizar prev_cents para siguiente iteración
-            prev_cents = new_cents
+        # si la cuerda objetivo cambia (selección o identificación automática) se aborta
+        target_string = self.active_string
+        controller = TuningController(
+            self.motor, self._read_cents_after_move,
+            cents_per_step=float(self.cents_per_step_var.get()) or 1.0,
+            max_steps=int(self.max_steps_var.get()) or 1,
+            timeout=float(self.step_timeout_var.get()),
+            should_abort=lambda: self.active_string != target_string,
+            should_stop=self._tracker_says_stop,
+        )
+        controller.run(initial_cents)
 
     def _is_freq_stable(self, freq):
         """
@@ -492,28 +601,54 @@ class TunerApp:
             self._stable_since = now
             return False
 
+    def _update_waterfall_time(self, captured):
+        """Ajusta el eje de tiempo de la cascada al periodo medido entre bloques capturados."""
+        if self._last_captured is not None:
+            # limitar saltos (p. ej. la ventana bloqueada) para que no dominen el promedio
+            dt = min(captured - self._last_captured, 5 * self._frame_nominal_s)
+            self._frame_s += 0.1 * (dt - self._frame_s)
+        self._last_captured = captured
+        x0, x1, y0, y1 = self.waterfall_img.get_extent()
+        span = self.waterfall.n_cols * self._frame_s
+        if abs(span + x0) > 0.02 * span:   # solo redibujar el eje si cambió apreciablemente
+            self.waterfall_img.set_extent((-span, 0, y0, y1))
+            self.ax_wf.set_xlim(-span, 0)
+
     def update_loop(self):
         if not self.running:
             return
         try:
-            audio = sd.rec(CHUNK, samplerate=FS, channels=1, dtype='float32', device=self.device_index)
+            # Graba directo en el buffer preasignado (sin arreglos nuevos por bloque)
+            sd.rec(CHUNK, samplerate=FS, channels=self.rec_buffer.shape[1], dtype='float32',
+                   device=self.device_index, out=self.rec_buffer)
             sd.wait()
-            data = np.nan_to_num(audio.flatten())
+            captured = time.time() - CHUNK / FS   # inicio aproximado del bloque
         except Exception as e:
             self.note_label.config(text="Error", fg="red")
             self.freq_var.set(f"Error: {e}")
             self.root.after(UPDATE_MS, self.update_loop)
             return
 
-        window = np.hanning(len(data))
-        fft = np.fft.rfft(data * window)
-        mag = np.abs(fft) / len(data)
-        self.fft_data = mag
+        # Una sola FFT por bloque: gráfica, nivel y frecuencia salen del mismo espectro
+        analysis = self.analysis_ctx.analyze(self.rec_buffer)
+        self.fft_data = analysis.magnitude()
         self.line.set_ydata(self.fft_data)
         self.ax.set_ylim(0, max(1e-6, self.fft_data.max()*1.2))
+        col = self.waterfall.push(self.fft_data[self._wf_lo:self._wf_hi])
+        self._wf_top += 0.1 * (float(col.max()) - self._wf_top)
+        self.waterfall_img.set_data(self.waterfall.view())
+        self._update_waterfall_time(captured)
+        self.waterfall_img.set_clim(self._wf_top - 60, self._wf_top)
         self.canvas.draw_idle()
 
-        freq = get_freq_autocorr(data)
+        valor = int(analysis.rms() * 5000)
+        self.barra_nivel['value'] = valor
+        if analysis.channels > 1:
+            self.nivel_var.set(f"Nivel: {valor} (canal {analysis.channel + 1})")
+        else:
+            self.nivel_var.set(f"Nivel: {valor}")
+
+        freq, confidence = analysis.pitch_with_confidence()
         if freq <= 0 or not np.isfinite(freq):
             self.note_label.config(text="—", fg="black")
             self.freq_var.set("Freq: - Hz")
@@ -521,21 +656,51 @@ class TunerApp:
             self.root.after(UPDATE_MS, self.update_loop)
             return
 
-        self.history.append(freq)
-        freq_s = float(np.mean(self.history))
+        session = self.mode_var.get() == SESSION_MODE
+        if session:
+            if not self._session_update(freq):
+                self.note_label.config(text="—\nCuerda no reconocida", fg="black")
+                self.freq_var.set(f"Freq: {freq:.1f} Hz")
+                self.cents_var.set("Cents: -")
+                self.root.after(UPDATE_MS, self.update_loop)
+                return
+            self.update_session_label()
+
+        # tras un movimiento no se promedian bloques capturados antes de que terminara
+        fresh = captured >= self._fresh_since
+        if fresh:
+            if self._history_since != self._fresh_since:
+                self.history.clear()
+                self._history_since = self._fresh_since
+                self._fresh = 0
+            self.history.append(freq)
+        freq_s = float(np.mean(self.history)) if self.history else freq
         self.latest_freq = freq_s
 
-        if self.mode_var.get() == "Afinador guitarra":
-            sel_string = self.string_var.get()
+        if self.mode_var.get() == "Afinador guitarra" or session:
+            sel_string = self._session_string if session else self.string_var.get()
+            self.active_string = sel_string
             target_freq = GUITAR_STRINGS.get(sel_string)
             cents = cents_difference(freq_s, target_freq)
+
+            # seguidor: predice con la trayectoria del motor y corrige con la lectura sin suavizar
+            if sel_string != self._tracker_string:
+                self.tracker.reset()
+                self._tracker_string = sel_string
+            # la lectura corresponde al centro del bloque capturado, no al instante de proceso
+            t_mid = captured + CHUNK / (2 * FS)
+            motor_pos = self.motor.position_at(t_mid) if self.motor else None
+            self.tracker.predict(t_mid, motor_pos, self._cents_per_step())
+            self.tracker.update(cents_difference(freq, target_freq), confidence)
             if cents is None or not np.isfinite(cents):
                 cents = 0.0
             self.freq_var.set(f"Freq: {freq_s:.1f} Hz (obj: {target_freq:.1f} Hz)")
             self.cents_var.set(f"Cents: {cents:+.1f}")
 
             action = ""
-            self.latest_cents = cents
+            if fresh:
+                self.latest_cents = cents
+                self._fresh += 1
 
             # Si la cuerda ya fue marcada como completada, NO mandar más comandos (hasta reiniciar o cambiar selección)
             if sel_string in self.completed_strings:
@@ -554,8 +719,7 @@ class TunerApp:
                 if abs(cents) <= GREEN_CENTS:
                     action = "Afinada (esperando estabilidad)"
                     color = "green"
-                    self.completed_strings.add(sel_string)
-                    self.update_completed_label()
+                    self._mark_completed(sel_string)
                 else:
                     action = "Esperando frecuencia estable"
                     color = "black"
@@ -567,7 +731,7 @@ class TunerApp:
             # Si estable y fuera del rango naranja, iniciar afinado automático (thread)
             if abs(cents) > ORANGE_CENTS and self.motor_enabled_var.get() and self.motor:
                 # evitar lanzar múltiples threads
-                if not hasattr(self, "_tuning_thread") or not getattr(self, "_tuning_thread").is_alive():
+                if not self._tuning_active():
                     cents_snapshot = cents
                     # iniciar algoritmo iterativo en hilo aparte
                     def tuning_task():
@@ -583,8 +747,7 @@ class TunerApp:
                 if abs(cents) <= GREEN_CENTS:
                     action = "Afinada"
                     color = "green"
-                    self.completed_strings.add(sel_string)
-                    self.update_completed_label()
+                    self._mark_completed(sel_string)
                 elif abs(cents) <= ORANGE_CENTS:
                     action = "Cerca"
                     color = "orange"
@@ -6,6 +6,7 @@ import serial                 # Comunicación serie (puertos COM) para interactu
 import serial.tools.list_ports # Herramientas para listar los puertos serie disponibles.
 import time                   # Funciones para manejo de tiempo y temporizadores.
 import threading              # Permite ejecutar tareas en paralelo (hilos) dentro del programa.
+from functools import lru_cache # Caché de los tiempos de fase por perfil de movimiento.
 
 # ---------- PARAMETROS ---------- (ajusta según necesidad)
 FS = 44100
@@ -13,12 +14,46 @@ CHUNK = 4096
 UPDATE_MS = 120
 SMOOTH_N = 5
 A4_FREQ = 440.0
+INPUT_CHANNELS = 4               # máximo de canales a capturar (se usa el mínimo con los del dispositivo)
+CHANNEL_MODE = "best"            # "best" = canal con mayor confianza, "weighted" = promedio por SNR
 
 ORANGE_CENTS = 20
 GREEN_CENTS = 5
 STABLE_MS_REQUIRED = 500         # ahora 500 ms (0.5 s) de estabilidad requerida
 STABLE_CENTS_THRESHOLD = 3.0     # tolerancia en cents para considerar "misma frecuencia" (ajustable)
 
+# Perfiles de movimiento del motor según el error restante en cents:
+# (cents mínimos, modo 'F' paso completo / 'H' medio paso, vmax [fases/s], aceleración [fases/s^2])
+# Correcciones grandes giran rápido; la aproximación final va lenta y en medio paso.
+MOVE_PROFILES = [
+    (50, 'F', 600, 2000),
+    (ORANGE_CENTS, 'F', 400, 1200),
+    (0, 'H', 300, 800),
+]
+# Deben coincidir con ESP32/stepper.ino (para estimar la trayectoria durante el movimiento)
+FW_STEP_DELAY_MS = 5             # stepDelay: 4 fases + 1 pausa por ciclo sin perfil
+FW_V_START = 150.0               # V_START de la rampa trapezoidal [fases/s]
+FW_CYCLES_PER_STEP = 5           # ciclos de firmware por paso del host (steps*5)
+MOVE_TIMEOUT_FACTOR = 1.25       # espera por DONE: al menos esto por la duración esperada...
+MOVE_TIMEOUT_MARGIN_S = 1.0      # ...más este margen (latencia serie, abortos)
+STOP_LATENCY_S = 0.05            # de decidir detener a que el firmware procese "S" (sondeo + serie)
+
+# Identificación automática de cuerda (modo sesión)
+STRING_ID_MAX_CENTS = 300        # más lejos que esto de toda cuerda -> no se reconoce
+STRING_ID_HYSTERESIS_CENTS = 50  # otra cuerda debe quedar al menos esto más cerca para cambiar
+
+# Juego (backlash) del tren de engranajes, en pasos del host: se aprende en cada cambio de sentido
+BACKLASH_MAX_STEPS = 20          # tope del juego estimado
+BACKLASH_ALPHA = 0.5             # peso de la nueva medición en el promedio exponencial
+
+# Seguimiento de afinación durante el movimiento (seguimiento.PitchTracker)
+TRACKER_MAX_STD_CENTS = 2.0      # desviación máxima para confiar en la estimación sin esperar lecturas
+
+# Cascada (espectrograma) en la interfaz
+WATERFALL_SECONDS = 5            # historial visible
+WATERFALL_FMIN = 60              # banda mostrada [Hz]
+WATERFALL_FMAX = 2000
+
 SOLFEGE = ['Do', 'Do#', 'Re', 'Re#', 'Mi', 'Fa', 'Fa#', 'Sol', 'Sol#', 'La', 'La#', 'Si']
 
 GUITAR_STRINGS = {
@@ -49,6 +84,15 @@ def open_serial(port, baud=115200, timeout=1):
         print("Error abriendo puerto serial:", e)
         return None
 
+# ---------- AUDIO helpers ----------
+def input_channels(device):
+    """Canales a capturar del dispositivo: min(INPUT_CHANNELS, canales de entrada disponibles)."""
+    try:
+        info = sd.query_devices(device, 'input')
+        return max(1, min(INPUT_CHANNELS, int(info.get('max_input_channels', 1))))
+    except Exception:
+        return 1
+
 # ---------- FRECUENCIA / NOTA ----------
 def freq_to_note_name(freq):
     if freq <= 0 or not np.isfinite(freq):
@@ -66,36 +110,108 @@ def cents_difference(freq, target_freq):
         return None
     return 1200 * log2(freq / target_freq)
 
-def get_freq_autocorr(data):
-    data = np.nan_to_num(np.asarray(data, dtype=float))
-    if np.allclose(data, 0):
-        return 0.0
-    data -= np.mean(data)
-    window = np.hanning(len(data))
-    data_w = data * window
-    corr = np.correlate(data_w, data_w, mode='full')
-    corr = corr[len(corr)//2:]
-    d = np.diff(corr)
-    try:
-        start = np.where(d > 0)[0][0]
-    except IndexError:
+def identify_string(freq, current=None):
+    """
+    Retorna la cuerda de GUITAR_STRINGS más cercana a 'freq' (en cents), o None
+    si ninguna está a menos de STRING_ID_MAX_CENTS. Con histéresis: se mantiene
+    'current' salvo que otra cuerda quede STRING_ID_HYSTERESIS_CENTS más cerca.
+    """
+    if freq <= 0 or not np.isfinite(freq):
+        return None
+    dist = {k: abs(cents_difference(freq, f)) for k, f in GUITAR_STRINGS.items()}
+    best = min(dist, key=dist.get)
+    if dist[best] > STRING_ID_MAX_CENTS:
+        return None
+    if current in dist and current != best and dist[current] - dist[best] < STRING_ID_HYSTERESIS_CENTS:
+        return current
+    return best
+
+def profile_for_cents(cents):
+    """Elige el perfil (modo, vmax, accel) de MOVE_PROFILES para el error 'cents' (None = más fino)."""
+    err = abs(cents) if cents is not None and np.isfinite(cents) else 0.0
+    for min_cents, mode, vmax, accel in MOVE_PROFILES:
+        if err >= min_cents:
+            return mode, vmax, accel
+    return MOVE_PROFILES[-1][1:]
+
+@lru_cache(maxsize=64)
+def _phase_schedule(cycles, profile=None):
+    """
+    Instantes [s] en que el firmware energiza cada fase de un movimiento de
+    'cycles' ciclos y su duración total, con los mismos retardos que
+    ESP32/stepper.ino (moverPerfil con perfil, moverAdelante/moverAtras sin él).
+    """
+    if profile is None:
+        # stepDelay tras cada una de las 4 fases y otro más al final de cada ciclo
+        k = np.arange(cycles * 4)
+        starts = (k + k // 4) * (FW_STEP_DELAY_MS / 1000.0)
+        duration = cycles * 5 * FW_STEP_DELAY_MS / 1000.0
+    else:
+        mode, vmax, accel = profile
+        total = cycles * (8 if mode == 'H' else 4)
+        i = np.arange(total, dtype=float)
+        v0 = FW_V_START
+        vmax = max(float(vmax), v0)
+        # velocidad limitada por la rampa de subida, la de bajada y vmax; delayMicroseconds trunca
+        v = np.minimum(vmax, np.minimum(np.sqrt(v0 * v0 + 2.0 * accel * i),
+                                        np.sqrt(v0 * v0 + 2.0 * accel * (total - 1 - i))))
+        delays = np.floor(1e6 / v) / 1e6
+        ends = np.cumsum(delays)
+        starts = ends - delays
+        duration = float(ends[-1]) if total else 0.0
+    starts.flags.writeable = False
+    return starts, duration
+
+def move_fraction(elapsed, cycles, profile=None):
+    """
+    Fracción (0..1) de un movimiento de 'cycles' ciclos de firmware completada
+    tras 'elapsed' segundos: fases ya energizadas / total, según el mismo perfil
+    que ejecuta el ESP32 (también en movimientos cortos, donde la rampa no es continua).
+    """
+    cycles = int(cycles)
+    if cycles <= 0:
+        return 1.0
+    if elapsed <= 0:
         return 0.0
-    peak = np.argmax(corr[start:]) + start
-    if peak == 0:
+    starts, _ = _phase_schedule(cycles, profile)
+    return float(np.searchsorted(starts, elapsed, side='right')) / len(starts)
+
+def move_duration(cycles, profile=None):
+    """Duración [s] de un movimiento de 'cycles' ciclos de firmware con 'profile'."""
+    cycles = int(cycles)
+    if cycles <= 0:
         return 0.0
-    return FS / peak
+    return _phase_schedule(cycles, profile)[1]
 
 # ---------- MOTOR CONTROLLER (protocolo simple) ----------
 class MotorController:
     """
     Protocolo: send "<dir><steps>\n" where dir is '+' (tensionar) or '-' (aflojar).
+    Con perfil: "<dir><steps>,<F|H>,<vmax>,<accel>\n" (rampa trapezoidal en el ESP32).
     ESP32 replies "DONE\n" when finished. Send "S\n" to stop/abort.
+
+    Lleva la posición absoluta (pasos efectivos, + = tensar) y el último sentido.
+    En cada cambio de sentido agrega backlash_steps pasos extra para recoger el
+    juego de los engranajes; learn_backlash() ajusta ese valor con la respuesta
+    medida en cents y last_move informa pasos ordenados vs efectivos.
+    last_move, last_direction y position solo cambian cuando llega DONE; si el
+    movimiento vence sin DONE se detiene el motor, position queda como mejor
+    estimación y position_known en False hasta reset_position().
     """
-    def __init__(self, ser):
+    def __init__(self, ser, backlash_steps=0.0):
         self.ser = ser
         self.lock = threading.Lock()
         self.last_response = None
         self._running = False
+        self.position = 0
+        self.last_direction = None
+        self.backlash_steps = float(backlash_steps)
+        self.last_move = None
+        self.position_known = True
+        self._pending = None          # movimiento enviado que aún no responde DONE
+        self._move_started = None     # instante de inicio del movimiento en curso
+        self._move_profile = None
+        self._last_span = None        # (inicio, fin, posición antes, posición después) del último movimiento
         if ser:
             self._running = True
             t = threading.Thread(target=self._reader_thread, daemon=True)
@@ -112,10 +228,31 @@ class MotorController:
                 pass
             time.sleep(0.01)
 
-    def send_move(self, direction, steps, timeout=10.0):
+    def send_move(self, direction, steps, timeout=10.0, profile=None, compensate=True, should_stop=None):
+        """
+        profile = (modo, vmax, accel) de profile_for_cents; None usa la velocidad fija del firmware.
+        Si el sentido cambia respecto al movimiento anterior y compensate=True,
+        envía además round(backlash_steps) pasos para recoger el juego.
+        should_stop: función opcional consultada mientras el motor gira; si retorna
+        True se envía "S" y el movimiento termina antes (detención anticipada).
+        timeout es la espera mínima: se alarga si la duración esperada del
+        movimiento perfilado (move_duration) la supera. Si vence sin DONE se
+        envía "S" para no dejar el motor girando.
+        """
         if not self.ser or not self.ser.is_open:
             return False
-        cmd = f"{direction}{int(steps*5)}\n"
+        reversal = self.last_direction is not None and direction != self.last_direction
+        extra = int(round(self.backlash_steps)) if (reversal and compensate) else 0
+        sent = int(steps) + extra
+        move = {
+            "direction": direction, "commanded": int(steps), "sent": sent,
+            "backlash": extra, "reversal": reversal, "effective": None, "done": False,
+        }
+        if profile is None:
+            cmd = f"{direction}{int(sent*5)}\n"
+        else:
+            mode, vmax, accel = profile
+            cmd = f"{direction}{int(sent*5)},{mode},{int(vmax)},{int(accel)}\n"
         with self.lock:
             self.last_response = None
         try:
@@ -123,14 +260,111 @@ class MotorController:
         except Exception:
             return False
         t0 = time.time()
+        with self.lock:
+            self._pending = move
+            self._move_profile = profile
+            self._move_started = t0
+        stopped_at = None
+        timeout = max(timeout, MOVE_TIMEOUT_FACTOR * move_duration(sent * FW_CYCLES_PER_STEP, profile)
+                      + MOVE_TIMEOUT_MARGIN_S)
         while time.time() - t0 < timeout:
+            if stopped_at is None and should_stop is not None and should_stop():
+                stopped_at = self._commanded_effective(time.time())
+                self.stop()
             with self.lock:
                 if self.last_response is not None:
                     if "DONE" in self.last_response:
+                        done = steps if stopped_at is None else stopped_at
+                        before = self.position
+                        self.position += done if direction == '+' else -done
+                        self._last_span = (t0, time.time(), before, self.position)
+                        move["done"] = True
+                        move["stopped_early"] = stopped_at is not None
+                        self.last_move = move
+                        self.last_direction = direction
+                        self._pending = None
+                        self._move_started = None
                         return True
             time.sleep(0.02)
+        self.stop()   # sin DONE a tiempo: no dejar el motor girando
+        with self.lock:
+            # no se sabe cuánto giró ni si el juego quedó recogido: mejor estimación
+            # de la posición (lo programado hasta ahora) y sin sentido previo
+            moved = self._commanded_effective(time.time())
+            self.position += moved if direction == '+' else -moved
+            self.position_known = False
+            self.last_direction = None
+            self._last_span = None
+            self._pending = None
+            self._move_started = None
         return False
 
+    def _commanded_effective(self, now):
+        """Pasos efectivos (sin el juego) recorridos hasta 'now' por el movimiento en curso."""
+        move = self._pending
+        if move is None or self._move_started is None:
+            return 0.0
+        frac = move_fraction(now - self._move_started, move["sent"] * FW_CYCLES_PER_STEP, self._move_profile)
+        return max(0.0, frac * move["sent"] - move["backlash"])
+
+    def position_at(self, now=None):
+        """
+        Posición estimada (pasos efectivos, + = tensar) en el instante 'now',
+        incluyendo el movimiento en curso. 'now' puede ser pasado (p. ej. el
+        centro de un bloque de audio capturado mientras el motor giraba): dentro
+        del último movimiento ya terminado se interpola entre sus extremos.
+        """
+        now = time.time() if now is None else now
+        with self.lock:   # send_move actualiza position y termina el movimiento bajo este lock
+            if self._move_started is None and self._last_span is not None:
+                start, end, before, after = self._last_span
+                if now < end:
+                    if now <= start:
+                        return before
+                    return before + (after - before) * (now - start) / (end - start)
+            moving = self._commanded_effective(now)
+            if self._pending and self._pending["direction"] == '-':
+                moving = -moving
+            return self.position + moving
+
+    def stopping_steps(self, now=None):
+        """
+        Pasos efectivos que el motor aún recorrería si se decide detenerlo en 'now':
+        lo programado durante STOP_LATENCY_S más el ciclo que el firmware termina
+        antes de revisar el aborto. 0 si no hay movimiento en curso.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            if self._pending is None or self._move_started is None:
+                return 0.0
+            ahead = self._commanded_effective(now + STOP_LATENCY_S) - self._commanded_effective(now)
+            return ahead + 1.0 / FW_CYCLES_PER_STEP
+
+    def learn_backlash(self, observed_cents, cents_per_step):
+        """
+        Informa el cambio de afinación medido tras el último movimiento.
+        Retorna los pasos efectivos (observed_cents / cents_per_step en el sentido
+        del movimiento) y, si el movimiento fue un cambio de sentido, actualiza
+        backlash_steps con los pasos que se perdieron en el juego.
+        """
+        move = self.last_move
+        if not move or not move["done"] or cents_per_step <= 0 or observed_cents is None:
+            return None
+        sign = 1 if move["direction"] == '+' else -1
+        effective = max(0.0, sign * observed_cents / cents_per_step)
+        move["effective"] = effective
+        if move["reversal"] and not move.get("stopped_early"):
+            lost = min(BACKLASH_MAX_STEPS, max(0.0, move["sent"] - effective))
+            self.backlash_steps += BACKLASH_ALPHA * (lost - self.backlash_steps)
+        return effective
+
+    def reset_position(self):
+        """Toma la posición actual como cero (conocida) y olvida el último sentido."""
+        self.position = 0
+        self.position_known = True
+        self.last_direction = None
+        self._last_span = None
+
     def stop(self):
         if self.ser and self.ser.is_open:
             try:
@@ -146,6 +380,87 @@ class MotorController:
             except Exception:
                 pass
 
+# ---------- AFINADO ITERATIVO (compartido por interfaz y servidor) ----------
+class TuningController:
+    """
+    Algoritmo iterativo con reducción de pasos por overshoot:
+     - initial_n = max_steps (parámetro)
+     - steps a mover inicialmente = min(initial_n, rounding(initial_cents / cents_per_step)) o initial_n si esto da 0
+     - detener cuando abs(cents) <= GREEN_CENTS (antes de revisar overshoot: caer
+       en la zona verde al otro lado del objetivo también es estar afinada)
+     - si overshoot -> reverse según el overshoot medido (abs(cents) / cents_per_step),
+       limitado a n / ((m+1)^2) (m = número de overshoots) para amortiguar un
+       cents_per_step mal estimado
+
+    Cada movimiento, también la reversión por overshoot, se mide y se informa
+    a MotorController.learn_backlash (así se aprende el juego en los cambios de
+    sentido). Es bloqueante (se ejecuta en un hilo). Quien lo usa entrega las lecturas:
+     - read_cents(): espera SMOOTH_N lecturas capturadas después del último
+       movimiento y retorna los cents suavizados (None si no llegan).
+     - should_abort(): True si hay que abandonar (cambió la cuerda o se detuvo).
+     - should_stop(start_cents): opcional, consultada mientras el motor gira
+       (detención anticipada, ver MotorController.send_move).
+    """
+    def __init__(self, motor, read_cents, cents_per_step=1.0, max_steps=50, timeout=10.0,
+                 should_abort=None, should_stop=None, max_iterations=10):
+        self.motor = motor
+        self.read_cents = read_cents
+        self.cents_per_step = cents_per_step or 1.0
+        self.max_steps = max(1, int(max_steps))
+        self.timeout = timeout
+        self.should_abort = should_abort or (lambda: False)
+        self.should_stop = should_stop
+        self.max_iterations = max_iterations
+
+    def _move(self, direction, steps, cents):
+        # velocidad según el error restante: rápido si está lejos, medio paso lento al final
+        stop = (lambda: self.should_stop(cents)) if self.should_stop is not None else None
+        return self.motor.send_move(direction, steps, timeout=self.timeout,
+                                    profile=profile_for_cents(cents), should_stop=stop)
+
+    def run(self, initial_cents):
+        """Afina desde initial_cents. Retorna los últimos cents medidos (None si no hubo lectura)."""
+        cents_per_step = self.cents_per_step
+        initial_n = self.max_steps
+        prev_cents = initial_cents
+        new_cents = None
+        overshoots = 0
+
+        for _ in range(self.max_iterations):
+            # calcular pasos sugeridos en base a prev_cents, pero no más que initial_n
+            suggested = int(round(abs(prev_cents) / cents_per_step))
+            steps = initial_n if suggested <= 0 else min(initial_n, suggested)
+
+            # tras overshoots, limitar según n/((m+1)^2): la reversión sigue el overshoot medido
+            if overshoots:
+                steps = min(steps, max(1, int(round(initial_n / ((overshoots + 1) ** 2)))))
+
+            if self.should_abort():
+                break
+
+            direction = '+' if prev_cents < 0 else '-'
+            if not self._move(direction, steps, prev_cents):
+                break
+
+            new_cents = self.read_cents()
+            if new_cents is None:
+                break
+
+            # informar al motor el cambio medido (aprende el juego en cambios de sentido)
+            self.motor.learn_backlash(new_cents - prev_cents, cents_per_step)
+
+            # si ya afinada -> salir (aunque haya cruzado el objetivo)
+            if abs(new_cents) <= GREEN_CENTS:
+                break
+
+            # si sign flipped -> overshoot: la siguiente iteración revierte en sentido contrario
+            if (prev_cents < 0 < new_cents) or (prev_cents > 0 > new_cents):
+                overshoots += 1
+
+            # actualizar prev_cents para siguiente iteración
+            prev_cents = new_cents
+        return new_cents
+
 
 # Lanzar la interfaz gráfica desde el archivo interfaz.py
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+import threading
+from math import sqrt
+
+# ---------- SEGUIMIENTO DE AFINACION (filtro de Kalman 1-D) ----------
+# Estado: error de afinación en cents respecto a la cuerda objetivo.
+# Predicción: el motor cambia la afinación en cents_per_step por cada paso
+# efectivo recorrido (MotorController.position_at), y la cuerda deriva
+# lentamente. Corrección: cada lectura de audio, con ruido según su confianza.
+
+class PitchTracker:
+    def __init__(self, drift_var=4.0, meas_var=9.0, gain_rel_std=0.3, gate_sigmas=4.0, max_rejects=3):
+        """
+        drift_var: varianza de la deriva de la cuerda [cents^2/s].
+        meas_var: varianza de una lectura con confianza 1 [cents^2].
+        gain_rel_std: incertidumbre relativa de cents_per_step (se suma por cada paso movido).
+        gate_sigmas: lecturas más lejos que esto (en desviaciones) se descartan (errores de octava).
+        max_rejects: tras tantas lecturas descartadas seguidas se reinicia el filtro.
+        """
+        self.drift_var = drift_var
+        self.meas_var = meas_var
+        self.gain_rel_std = gain_rel_std
+        self.gate_sigmas = gate_sigmas
+        self.max_rejects = max_rejects
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.x = None            # cents estimados (None = sin inicializar)
+            self.P = None            # varianza [cents^2]
+            self._t = None
+            self._motor_pos = None
+            self._rejects = 0
+            self.last_update = None  # instante de la última lectura aceptada (el de predict)
+
+    def predict(self, now, motor_pos=None, cents_per_step=1.0):
+        """Avanza el estado hasta 'now' con el movimiento del motor desde la última llamada."""
+        with self.lock:
+            if self.x is None:
+                self._t = now
+                self._motor_pos = motor_pos
+                return
+            dt = max(0.0, now - self._t) if self._t is not None else 0.0
+            self.P += self.drift_var * dt
+            if motor_pos is not None and self._motor_pos is not None:
+                du = (motor_pos - self._motor_pos) * cents_per_step
+                self.x += du
+                self.P += (self.gain_rel_std * du) ** 2
+            self._t = now
+            self._motor_pos = motor_pos
+
+    def update(self, cents, confidence=1.0):
+        """
+        Corrige con una lectura de audio tomada en el instante del último predict()
+        (el centro del bloque capturado). Retorna False si la lectura se descartó.
+        """
+        if cents is None:
+            return False
+        r = self.meas_var / max(confidence, 0.05)
+        with self.lock:
+            if self.x is None:
+                self.x, self.P = float(cents), r
+                self._rejects = 0
+                self.last_update = self._t
+                return True
+            innov = cents - self.x
+            s = self.P + r
+            if abs(innov) > self.gate_sigmas * sqrt(s):
+                self._rejects += 1
+                if self._rejects >= self.max_rejects:
+                    # el modelo perdió la cuerda (p. ej. se tocó otra): reiniciar en la lectura
+                    self.x, self.P = float(cents), r
+                    self._rejects = 0
+                    self.last_update = self._t
+                return False
+            k = self.P / s
+            self.x += k * innov
+            self.P *= (1 - k)
+            self._rejects = 0
+            self.last_update = self._t
+            return True
+
+    def estimate(self, now=None, motor_pos=None, cents_per_step=1.0):
+        """
+        Retorna (cents, desviación) o (None, None) si aún no hay lecturas.
+        Con 'now' y 'motor_pos' proyecta el estado hasta ese instante con el
+        movimiento del motor desde la última lectura, sin modificar el filtro
+        (mismo modelo que predict()).
+        """
+        with self.lock:
+            if self.x is None:
+                return None, None
+            x, P = self.x, self.P
+            if now is not None and self._t is not None:
+                P += self.drift_var * max(0.0, now - self._t)
+            if motor_pos is not None and self._motor_pos is not None:
+                du = (motor_pos - self._motor_pos) * cents_per_step
+                x += du
+                P += (self.gain_rel_std * du) ** 2
+            return x, sqrt(P)
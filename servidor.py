@@ -0,0 +1,308 @@
+"""
+Servidor (daemon) del afinador sin interfaz gráfica.
+
+Es el único proceso que abre el micrófono y el puerto serie del ESP32. Publica
+la frecuencia/cents/estado a todos los clientes conectados y acepta comandos
+por un socket local (TCP o Unix) con protocolo JSON-lines: un objeto JSON por
+línea, en ambos sentidos.
+
+Comandos (cliente -> servidor):
+    {"cmd": "status"}
+    {"cmd": "select_string", "string": "5 - La (A2)"}
+    {"cmd": "start_tune"}
+    {"cmd": "stop_tune"}
+    {"cmd": "calibrate", "steps": 20}          (1..max_steps)
+
+Mensajes (servidor -> cliente):
+    {"type": "update", "freq": ..., "cents": ..., "confidence": ..., "state": ..., "string": ...}
+    {"type": "reply", "cmd": ..., "ok": true/false, ...}
+
+Cada cliente tiene una cola acotada: si un cliente lento no alcanza a leer, se
+descartan sus actualizaciones más antiguas (las respuestas a comandos nunca se
+descartan) y el resto de los clientes no se ve afectado.
+
+Uso: python servidor.py [--host 127.0.0.1] [--port 8765] [--unix /tmp/afinador.sock] [--device N]
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+import sounddevice as sd
+
+from analisis import AnalysisContext
+from main import (
+    FS, CHUNK, SMOOTH_N, GREEN_CENTS, ORANGE_CENTS, GUITAR_STRINGS,
+    freq_to_note_name, cents_difference, find_esp32_port, open_serial, MotorController,
+    TuningController, profile_for_cents, input_channels, CHANNEL_MODE,
+)
+
+CLIENT_QUEUE_MAX = 32      # actualizaciones pendientes por cliente antes de descartar las antiguas
+MIN_CONFIDENCE = 0.3       # confianza mínima de la autocorrelación para publicar una lectura
+MOVE_TIMEOUT = 8.0         # s, igual que el valor por defecto de la interfaz
+SETTLE_TIMEOUT = 2.0       # s de espera máxima por SMOOTH_N lecturas nuevas tras un movimiento
+
+class _Client:
+    """Cola de salida de un cliente. Solo las actualizaciones se pueden descartar."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = deque()          # pares (mensaje, descartable)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def offer(self, msg, droppable=True):
+        """Encola sin bloquear; si hay demasiadas actualizaciones pendientes descarta la más antigua."""
+        if droppable and sum(1 for _, d in self.pending if d) >= CLIENT_QUEUE_MAX:
+            for i, (_, d) in enumerate(self.pending):
+                if d:
+                    del self.pending[i]
+                    self.dropped += 1
+                    break
+        self.pending.append((msg, droppable))
+        self.ready.set()
+
+    async def next_messages(self):
+        await self.ready.wait()
+        self.ready.clear()
+        msgs = [m for m, _ in self.pending]
+        self.pending.clear()
+        return msgs
+
+class TunerDaemon:
+    def __init__(self, device=None, cents_per_step=1.0, max_steps=50):
+        self.device = device
+        self.clients = set()
+        self.history = deque(maxlen=SMOOTH_N)
+        self.channels = input_channels(device)
+        self.ctx = AnalysisContext(CHUNK, FS, self.channels, CHANNEL_MODE)
+        self.string = next(iter(GUITAR_STRINGS))
+        self.tuning = False
+        self.cents_per_step = cents_per_step
+        self.max_steps = max_steps
+        self.state = "idle"
+        self.latest = {"freq": None, "cents": None, "confidence": 0.0}
+        self._motor_busy = False
+        self._fresh = 0                  # lecturas acumuladas desde el último _restart_history
+        self._fresh_since = 0.0          # solo cuentan bloques capturados después de este instante
+        self._loop = None
+        self.motor = None
+        port = find_esp32_port()
+        if port is not None:
+            ser = open_serial(port, 115200, timeout=0.1)
+            if ser:
+                self.motor = MotorController(ser)
+
+    # ---------- difusión a clientes ----------
+    def broadcast(self, msg):
+        for c in list(self.clients):
+            c.offer(msg)
+
+    async def _client_writer(self, client):
+        try:
+            while True:
+                msgs = await client.next_messages()
+                client.writer.write("".join(json.dumps(m) + "\n" for m in msgs).encode("utf-8"))
+                await client.writer.drain()   # backpressure: mientras espera, la cola descarta lo antiguo
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def handle_client(self, reader, writer):
+        client = _Client(writer)
+        self.clients.add(client)
+        writer_task = asyncio.ensure_future(self._client_writer(client))
+        client.offer(self.status(), droppable=False)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = json.loads(line.decode("utf-8"))
+                    reply = await self.handle_command(req)
+                except (ValueError, AttributeError, TypeError) as e:
+                    reply = {"type": "reply", "cmd": None, "ok": False, "error": str(e)}
+                client.offer(reply, droppable=False)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer_task.cancel()
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    # ---------- comandos ----------
+    def status(self):
+        return {
+            "type": "reply", "cmd": "status", "ok": True, "string": self.string,
+            "tuning": self.tuning, "state": self.state, "motor": self.motor is not None,
+            "cents_per_step": self.cents_per_step, **self.latest,
+            "position": self.motor.position if self.motor else None,
+            "position_known": self.motor.position_known if self.motor else None,
+            "backlash_steps": self.motor.backlash_steps if self.motor else None,
+            "last_move": self.motor.last_move if self.motor else None,
+        }
+
+    async def handle_command(self, req):
+        cmd = req.get("cmd")
+        if cmd == "status":
+            return self.status()
+        if cmd == "select_string":
+            name = req.get("string")
+            if not isinstance(name, str) or name not in GUITAR_STRINGS:
+                return {"type": "reply", "cmd": cmd, "ok": False, "error": f"cuerda desconocida: {name}"}
+            self.string = name
+            self._restart_history(time.time())
+            return {"type": "reply", "cmd": cmd, "ok": True, "string": name}
+        if cmd == "start_tune":
+            self.tuning = self.motor is not None
+            return {"type": "reply", "cmd": cmd, "ok": self.tuning}
+        if cmd == "stop_tune":
+            self.tuning = False
+            if self.motor:
+                self.motor.stop()
+            return {"type": "reply", "cmd": cmd, "ok": True}
+        if cmd == "calibrate":
+            steps = req.get("steps", 20)
+            if isinstance(steps, bool) or not isinstance(steps, int) or not 1 <= steps <= self.max_steps:
+                return {"type": "reply", "cmd": cmd, "ok": False,
+                        "error": f"pasos inválidos: {steps} (1..{self.max_steps})"}
+            return await self.calibrate(steps)
+        return {"type": "reply", "cmd": cmd, "ok": False, "error": "comando desconocido"}
+
+    async def _move(self, direction, steps, cents=None):
+        loop = asyncio.get_running_loop()
+        self._motor_busy = True
+        try:
+            return await loop.run_in_executor(
+                None, self.motor.send_move, direction, steps, MOVE_TIMEOUT, profile_for_cents(cents)
+            )
+        finally:
+            self._motor_busy = False
+
+    def _restart_history(self, since):
+        """Descarta el historial; solo se suavizan bloques capturados desde 'since' (hilo del loop)."""
+        self.history.clear()
+        self._fresh = 0
+        self._fresh_since = since
+
+    def _fresh_cents(self, timeout=SETTLE_TIMEOUT):
+        """
+        Bloqueante (hilo del controlador): reinicia el historial y espera SMOOTH_N
+        lecturas capturadas después de este instante. Retorna los cents suavizados
+        o None si no llegan a tiempo.
+        """
+        since = time.time()
+        self._loop.call_soon_threadsafe(self._restart_history, since)
+        while time.time() - since < timeout:
+            if self._fresh_since == since and self._fresh >= SMOOTH_N:
+                return self.latest["cents"]
+            time.sleep(0.02)
+        return None
+
+    async def calibrate(self, steps):
+        """Mide cents/paso tensando 'steps' pasos y comparando la lectura antes y después."""
+        if not self.motor or self._motor_busy:
+            return {"type": "reply", "cmd": "calibrate", "ok": False, "error": "motor no disponible"}
+        self.tuning = False
+        before = self.latest["cents"]
+        if before is None or steps <= 0:
+            return {"type": "reply", "cmd": "calibrate", "ok": False, "error": "sin lectura estable"}
+        if not await self._move('+', steps):
+            self.motor.stop()   # no dejar la cuerda tensándose si no llegó DONE
+            return {"type": "reply", "cmd": "calibrate", "ok": False, "error": "timeout del motor"}
+        after = await asyncio.get_running_loop().run_in_executor(None, self._fresh_cents)
+        if after is None or after == before:
+            return {"type": "reply", "cmd": "calibrate", "ok": False, "error": "sin cambio medible"}
+        self.cents_per_step = abs(after - before) / steps
+        return {"type": "reply", "cmd": "calibrate", "ok": True, "cents_per_step": self.cents_per_step}
+
+    # ---------- afinado automático ----------
+    async def _tune(self, cents):
+        """Mismo controlador iterativo que la interfaz (main.TuningController), en un hilo aparte."""
+        string = self.string
+        controller = TuningController(
+            self.motor, self._fresh_cents, self.cents_per_step, self.max_steps, MOVE_TIMEOUT,
+            should_abort=lambda: not self.tuning or self.string != string,
+        )
+        self._motor_busy = True
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, controller.run, cents)
+        finally:
+            self._motor_busy = False
+
+    # ---------- captura y análisis ----------
+    async def audio_loop(self):
+        loop = asyncio.get_running_loop()
+        with sd.InputStream(device=self.device, channels=self.channels, samplerate=FS, dtype='float32') as stream:
+            while True:
+                audio, _ = await loop.run_in_executor(None, stream.read, CHUNK)
+                captured = time.time() - CHUNK / FS   # inicio aproximado del bloque
+                freq, conf = self.ctx.analyze(audio).pitch_with_confidence()
+                self.process(freq, conf, captured)
+
+    def process(self, freq, conf, captured=None):
+        if captured is not None and captured < self._fresh_since:
+            return   # bloque capturado antes del último movimiento o cambio de cuerda
+        if freq <= 0 or not np.isfinite(freq) or conf < MIN_CONFIDENCE:
+            self.latest = {"freq": None, "cents": None, "confidence": conf}
+            self.state = "silence"
+            self.broadcast({"type": "update", "state": self.state, "string": self.string, **self.latest})
+            return
+        self.history.append(freq)
+        freq_s = float(np.mean(self.history))
+        target = GUITAR_STRINGS[self.string]
+        cents = cents_difference(freq_s, target)
+        note_name, octave, _ = freq_to_note_name(freq_s)
+        if abs(cents) <= GREEN_CENTS:
+            self.state = "in_tune"
+        elif abs(cents) <= ORANGE_CENTS:
+            self.state = "close"
+        else:
+            self.state = "out_of_tune"
+        self.latest = {"freq": freq_s, "cents": cents, "confidence": conf, "channel": self.ctx.channel}
+        self._fresh += 1
+        self.broadcast({
+            "type": "update", "state": self.state, "string": self.string,
+            "note": f"{note_name}{octave}", "tuning": self.tuning, **self.latest,
+        })
+        if self.tuning and self.state == "in_tune" and not self._motor_busy:
+            # con el controlador en curso, una lectura verde pasajera no termina el afinado
+            self.tuning = False
+            self.broadcast({"type": "update", "state": "done", "string": self.string, **self.latest})
+        elif (self.tuning and not self._motor_busy
+              and len(self.history) == self.history.maxlen and abs(cents) > GREEN_CENTS):
+            self._motor_busy = True   # hasta que _tune arranque, no lanzar otro
+            asyncio.ensure_future(self._tune(cents))
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        self._loop = asyncio.get_running_loop()
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.audio_loop())
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor del afinador (JSON-lines)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="ruta de socket Unix (en vez de TCP)")
+    parser.add_argument("--device", type=int, default=None, help="índice del dispositivo de entrada")
+    args = parser.parse_args()
+    daemon = TunerDaemon(device=args.device)
+    try:
+        asyncio.run(daemon.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if daemon.motor:
+            daemon.motor.stop()
+            daemon.motor.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark del análisis por lotes (analisis.analyze_signal) frente a analizar
+cuadro por cuadro con AnalysisContext y frente al algoritmo original con
+np.correlate. Verifica además que las tres rutas den la misma frecuencia
+(el original no corrige errores de octava con el HPS: en esos bloques difiere).
+
+Uso: python tests/bench_analisis.py [segundos]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analisis import AnalysisContext, analyze_signal   # noqa: E402
+
+FS = 44100
+CHUNK = 4096
+
+def original_pitch(data, fs=FS):
+    """get_freq_autocorr original (np.correlate en O(n^2))."""
+    data = np.nan_to_num(np.asarray(data, dtype=float))
+    if np.allclose(data, 0):
+        return 0.0
+    data -= np.mean(data)
+    data_w = data * np.hanning(len(data))
+    corr = np.correlate(data_w, data_w, mode='full')[len(data) - 1:]
+    d = np.diff(corr)
+    rising = np.where(d > 0)[0]
+    if len(rising) == 0:
+        return 0.0
+    peak = np.argmax(corr[rising[0]:]) + rising[0]
+    return 0.0 if peak == 0 else fs / peak
+
+def guitar_signal(seconds, fs=FS, seed=0):
+    """Secuencia de notas de guitarra sintéticas (armónicos + ruido), 1 s por nota."""
+    rng = np.random.default_rng(seed)
+    notes = [82.41, 110.0, 146.83, 196.0, 246.94, 329.63]
+    parts = []
+    for i in range(int(seconds)):
+        f = notes[i % len(notes)]
+        t = np.arange(fs) / fs
+        x = sum(np.sin(2 * np.pi * f * k * t + rng.uniform(0, 6)) / k ** 0.8 for k in range(1, 8))
+        parts.append(0.2 * x + 0.05 * rng.standard_normal(fs))
+    return np.concatenate(parts).astype(np.float32)
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    x = guitar_signal(seconds)
+    n_frames = len(x) // CHUNK
+    frames = [x[i * CHUNK:(i + 1) * CHUNK] for i in range(n_frames)]
+
+    t_batch, (f_batch, _, _) = best_of(lambda: analyze_signal(x, FS, frame_len=CHUNK, hop=CHUNK))
+    ctx = AnalysisContext(CHUNK, FS)
+    t_loop, f_loop = best_of(lambda: np.array([ctx.analyze(fr).pitch() for fr in frames]))
+    t_orig, f_orig = best_of(lambda: np.array([original_pitch(fr) for fr in frames]), repeat=1)
+
+    print(f"{n_frames} cuadros de {CHUNK} muestras ({seconds:g} s de audio)")
+    print(f"  lotes (analyze_signal):        {t_batch * 1e3:8.1f} ms")
+    print(f"  cuadro a cuadro (contexto):    {t_loop * 1e3:8.1f} ms  ({t_loop / t_batch:.2f}x)")
+    print(f"  original (np.correlate):       {t_orig * 1e3:8.1f} ms  ({t_orig / t_batch:.2f}x)")
+    print(f"  máx. diferencia vs cuadro a cuadro: {np.max(np.abs(f_batch - f_loop)):.3g} Hz")
+    print(f"  máx. diferencia vs original:        {np.max(np.abs(f_batch - f_orig)):.3g} Hz")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Pruebas del análisis por bloque (analisis.AnalysisContext).
+
+Ejecutar desde la raíz del repositorio: python -m pytest -q
+"""
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import analisis                                                             # noqa: E402
+from analisis import AnalysisContext, analyze_frames, autocorr_fft_len   # noqa: E402
+
+FS = 44100
+N = 4096
+
+def tone(f, n=N, seed=0, noise=0.05, sub=0.0):
+    """Nota sintética: 7 armónicos decrecientes, ruido y opcionalmente una subarmónica f/2."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / FS
+    x = sum(np.sin(2 * np.pi * f * k * t + rng.uniform(0, 6)) / k ** 0.8 for k in range(1, 8))
+    x = x + sub * np.sin(2 * np.pi * f / 2 * t)
+    return (0.2 * x + noise * rng.standard_normal(n)).astype(np.float32)
+
+def correlate_pitch(data):
+    """get_freq_autocorr original (np.correlate), como referencia."""
+    data = np.asarray(data, dtype=float)
+    data = (data - data.mean()) * np.hanning(len(data))
+    corr = np.correlate(data, data, mode='full')[len(data) - 1:]
+    start = np.where(np.diff(corr) > 0)[0][0]
+    return FS / (np.argmax(corr[start:]) + start)
+
+def peak_bytes(fn, repeat=5):
+    """Pico de memoria asignada por Python/NumPy durante fn(), en bytes."""
+    fn()
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+        return peak
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize("f", [82.41, 110.0, 146.83, 196.0, 246.94, 329.63])
+def test_igual_a_np_correlate(f):
+    ctx = AnalysisContext(N, FS)
+    for seed in range(3):
+        x = tone(f, seed=seed)
+        assert ctx.analyze(x).pitch() == pytest.approx(correlate_pitch(x), rel=1e-9)
+
+@pytest.mark.parametrize("f", [82.41, 146.83, 329.63])
+def test_corrige_error_de_octava(f):
+    x = tone(f, sub=0.6)
+    assert correlate_pitch(x) == pytest.approx(f / 2, rel=0.02)   # la autocorrelación sola falla
+    assert AnalysisContext(N, FS).analyze(x).pitch() == pytest.approx(f, rel=0.02)
+
+def test_lotes_igual_a_cuadro_a_cuadro():
+    frames = np.stack([tone(f, seed=i) for i, f in enumerate(np.geomspace(80, 700, 24))])
+    freq, _, conf = analyze_frames(frames, FS)
+    ctx = AnalysisContext(N, FS)
+    for i, x in enumerate(frames):
+        f, c = ctx.analyze(x).pitch_with_confidence()
+        assert freq[i] == f
+        assert conf[i] == pytest.approx(c, abs=1e-5)
+
+def test_multicanal_elige_el_canal_limpio():
+    rng = np.random.default_rng(1)
+    clean = tone(196.0, noise=0.01)
+    noisy = (0.05 * clean + 0.3 * rng.standard_normal(N)).astype(np.float32)
+    ctx = AnalysisContext(N, FS, channels=3)
+    ctx.analyze(np.stack([noisy, clean, noisy], axis=1))
+    assert ctx.channel == 1
+    assert ctx.pitch() == pytest.approx(196.0, rel=0.01)
+
+def test_multicanal_histeresis_al_cambiar_de_canal():
+    rng = np.random.default_rng(2)
+    clean = tone(196.0, noise=0.01)
+    noisy = (0.05 * clean + 0.3 * rng.standard_normal(N)).astype(np.float32)
+    ctx = AnalysisContext(N, FS, channels=2)
+    ctx.analyze(np.stack([clean, noisy], axis=1))
+    assert ctx.channel == 0
+    swapped = np.stack([noisy, clean], axis=1)
+    # el otro canal es claramente mejor: cambia recién al CHANNEL_SWITCH_FRAMES-ésimo bloque seguido
+    for _ in range(analisis.CHANNEL_SWITCH_FRAMES - 1):
+        ctx.analyze(swapped)
+        assert ctx.channel == 0
+    ctx.analyze(np.stack([clean, noisy], axis=1))   # un bloque a favor del actual reinicia la cuenta
+    for _ in range(analisis.CHANNEL_SWITCH_FRAMES - 1):
+        ctx.analyze(swapped)
+        assert ctx.channel == 0
+    ctx.analyze(swapped)
+    assert ctx.channel == 1
+    assert ctx.pitch() == pytest.approx(196.0, rel=0.01)
+    # casi empatados: se mantiene el canal actual indefinidamente
+    for _ in range(2 * analisis.CHANNEL_SWITCH_FRAMES):
+        ctx.analyze(np.stack([clean, clean * 0.98], axis=1))
+        assert ctx.channel == 1
+
+def test_multicanal_canal_actual_sin_tono_cambia_de_inmediato():
+    ctx = AnalysisContext(N, FS, channels=2)
+    clean = tone(196.0, noise=0.01)
+    ctx.analyze(np.stack([clean, 0.5 * clean], axis=1))
+    assert ctx.channel == 0
+    ctx.analyze(np.stack([np.zeros(N, np.float32), clean], axis=1))
+    assert ctx.channel == 1
+    ctx.analyze(np.zeros((N, 2), np.float32))        # silencio en todos: se queda donde estaba
+    assert ctx.channel == 1
+
+def test_bloque_con_nan_o_silencio():
+    ctx = AnalysisContext(N, FS)
+    x = tone(110.0)
+    x[100:120] = np.nan
+    assert ctx.analyze(x).pitch() == pytest.approx(110.0, rel=0.01)
+    assert ctx.analyze(np.zeros(N, dtype=np.float32)).pitch_with_confidence() == (0.0, 0.0)
+
+@pytest.mark.parametrize("channels", [1, 4])
+def test_regimen_estable_solo_asignan_las_fft(channels):
+    """
+    En régimen estable analyze() no retiene memoria y su pico de asignación
+    no supera al de las dos FFT de NumPy (buffers temporales internos).
+    """
+    ctx = AnalysisContext(N, FS, channels=channels)
+    x = np.stack([tone(110.0, seed=i) for i in range(channels)], axis=1)
+
+    def frame():
+        ctx.analyze(x)
+        ctx.magnitude()
+        ctx.rms()
+
+    def fft_only():
+        # igual que AnalysisContext._run: out= solo si np.fft lo acepta (NumPy >= 2.0)
+        if analisis._FFT_OUT:
+            np.fft.rfft(ctx.padded, axis=1, out=ctx.spectrum)
+            np.fft.irfft(ctx.power, n=ctx.fft_len, axis=1, out=ctx.corr_full)
+        else:
+            ctx.spectrum[...] = np.fft.rfft(ctx.padded, axis=1)
+            ctx.corr_full[...] = np.fft.irfft(ctx.power, n=ctx.fft_len, axis=1)
+
+    for _ in range(3):
+        frame()
+    tracemalloc.start()
+    try:
+        # NumPy guarda bloques pequeños (dims de vistas) en una caché acotada que
+        # se llena durante los primeros bloques trazados: se mide después
+        for _ in range(50):
+            frame()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(200):
+            frame()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert retained < 4096
+    assert peak_bytes(frame) <= peak_bytes(fft_only) + 4096
+
+def test_fft_corta_para_lotes():
+    m = autocorr_fft_len(N, FS)
+    assert N + FS / 40 < m < 2 * N
+    with pytest.raises(ValueError):
+        AnalysisContext(N, FS, fft_len=N)
+
+def test_lotes_reconstruye_contexto_de_otra_fs():
+    frames = np.stack([tone(110.0, seed=i) for i in range(4)])
+    ajeno = AnalysisContext(N, 48000, channels=4, fft_len=autocorr_fft_len(N, 48000))
+    freq, _, _ = analyze_frames(frames, FS, ctx=ajeno)
+    assert freq == pytest.approx(110.0, rel=0.01)
+
+@pytest.mark.parametrize("n", [2, 3, 4, 8, 16])
+def test_bloques_muy_cortos_no_fallan(n):
+    rng = np.random.default_rng(n)
+    freq, _, conf = analyze_frames(rng.standard_normal((3, n)), FS)
+    assert np.all(np.isfinite(freq)) and np.all(np.isfinite(conf))
@@ -0,0 +1,58 @@
+"""
+Pruebas de la identificación de cuerda (main.identify_string).
+
+Ejecutar desde la raíz del repositorio: python -m pytest -q
+Requiere las dependencias de main.py (sounddevice, pyserial).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+try:
+    import main   # noqa: E402
+except (ImportError, OSError) as e:   # sounddevice sin PortAudio lanza OSError
+    pytest.skip(f"main.py no se puede importar: {e}", allow_module_level=True)
+
+E2, A2, D3, G3, B3, E4 = main.GUITAR_STRINGS
+
+def at(string, cents):
+    """Frecuencia a 'cents' de la cuerda 'string'."""
+    return main.GUITAR_STRINGS[string] * 2 ** (cents / 1200)
+
+@pytest.mark.parametrize("string", list(main.GUITAR_STRINGS))
+@pytest.mark.parametrize("cents", [-150, -30, 0, 12, 150])
+def test_cuerda_mas_cercana(string, cents):
+    assert main.identify_string(at(string, cents)) == string
+
+@pytest.mark.parametrize("low, high, gap", [(E2, A2, 500), (A2, D3, 500), (D3, G3, 500),
+                                            (G3, B3, 400), (B3, E4, 500)])
+@pytest.mark.parametrize("margin", [10, 40])
+def test_histeresis_mantiene_la_cuerda_actual(low, high, gap, margin):
+    # pasado el punto medio, pero 'margin' < STRING_ID_HYSTERESIS_CENTS más cerca de la otra cuerda
+    cents = (gap + margin) / 2
+    assert main.identify_string(at(low, cents)) == high
+    assert main.identify_string(at(low, cents), current=low) == low
+    assert main.identify_string(at(high, -cents), current=high) == high
+    assert main.identify_string(at(high, -cents), current=low) == low
+
+@pytest.mark.parametrize("low, high, gap", [(E2, A2, 500), (G3, B3, 400), (B3, E4, 500)])
+@pytest.mark.parametrize("margin", [60, 150])
+def test_histeresis_cambia_si_otra_queda_mas_cerca(low, high, gap, margin):
+    cents = (gap + margin) / 2
+    assert main.identify_string(at(low, cents), current=low) == high
+    assert main.identify_string(at(high, -cents), current=high) == low
+
+@pytest.mark.parametrize("freq", [at(E2, -310), at(E2, -1200), at(E4, 310), at(E4, 1200)])
+@pytest.mark.parametrize("current", [None, E2, E4])
+def test_lejos_de_toda_cuerda_no_se_reconoce(freq, current):
+    assert main.identify_string(freq, current=current) is None
+
+@pytest.mark.parametrize("freq", [at(E2, -290), at(E4, 290)])
+def test_dentro_del_limite_se_reconoce(freq):
+    assert main.identify_string(freq) is not None
+
+@pytest.mark.parametrize("freq", [0.0, -82.4, float("nan"), float("inf")])
+def test_frecuencia_invalida(freq):
+    assert main.identify_string(freq, current=A2) is None
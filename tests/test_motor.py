@@ -0,0 +1,278 @@
+"""
+Pruebas del modelo del motor (main.py) contra el firmware (ESP32/stepper.ino).
+
+Ejecutar desde la raíz del repositorio: python -m pytest -q
+Requiere las dependencias de main.py (sounddevice, pyserial).
+"""
+import math
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+try:
+    import main   # noqa: E402
+except (ImportError, OSError) as e:   # sounddevice sin PortAudio lanza OSError
+    pytest.skip(f"main.py no se puede importar: {e}", allow_module_level=True)
+
+with open(os.path.join(ROOT, "ESP32", "stepper.ino"), encoding="utf-8") as f:
+    FIRMWARE = f.read()
+
+def firmware_constant(pattern):
+    return float(re.search(pattern, FIRMWARE).group(1))
+
+V_START = firmware_constant(r"const float V_START = ([\d.]+);")
+STEP_DELAY_MS = firmware_constant(r"int stepDelay = (\d+);")
+
+def firmware_phase_starts(cycles, profile):
+    """Reimplementación directa de los bucles de moverPerfil / moverAdelante: inicio de cada fase [s]."""
+    starts = []
+    t = 0.0
+    if profile is None:
+        for _ in range(cycles):
+            for _ in range(4):
+                starts.append(t)
+                t += STEP_DELAY_MS / 1000.0
+            t += STEP_DELAY_MS / 1000.0
+        return starts, t
+    mode, vmax, accel = profile
+    total = cycles * (8 if mode == 'H' else 4)
+    vmax = max(vmax, V_START)
+    for i in range(total):
+        v_up = math.sqrt(V_START * V_START + 2.0 * accel * i)
+        v_down = math.sqrt(V_START * V_START + 2.0 * accel * (total - 1 - i))
+        v = min(vmax, min(v_up, v_down))
+        starts.append(t)
+        t += int(1000000.0 / v) / 1e6        # delayMicroseconds((unsigned long)...)
+    return starts, t
+
+def test_constantes_igual_al_firmware():
+    assert main.FW_V_START == V_START
+    assert main.FW_STEP_DELAY_MS == STEP_DELAY_MS
+
+@pytest.mark.parametrize("profile", [None] + [p[1:] for p in main.MOVE_PROFILES])
+@pytest.mark.parametrize("steps", [1, 2, 5, 20, 50])
+def test_move_fraction_igual_al_firmware(profile, steps):
+    cycles = steps * main.FW_CYCLES_PER_STEP
+    starts, duration = firmware_phase_starts(cycles, profile)
+    total = len(starts)
+    assert main.move_duration(cycles, profile) == pytest.approx(duration, rel=1e-9)
+    for k in range(40):
+        t = duration * (k + 0.5) / 40
+        done = sum(1 for s in starts if s <= t)
+        assert main.move_fraction(t, cycles, profile) == pytest.approx(done / total, abs=1e-9)
+    assert main.move_fraction(0.0, cycles, profile) == 0.0
+    assert main.move_fraction(duration + 1.0, cycles, profile) == 1.0
+
+def test_movimiento_largo_supera_el_timeout_por_defecto():
+    # 50 pasos en medio paso lento tardan ~6.8 s: send_move debe alargar su timeout según el perfil
+    cycles = 50 * main.FW_CYCLES_PER_STEP
+    assert main.move_duration(cycles, main.MOVE_PROFILES[-1][1:]) > 6.0
+
+# ---------- MotorController / TuningController con un puerto serie simulado ----------
+class FakeSerial:
+    """
+    Puerto serie con un eje simulado como el firmware: "<dir><ciclos>[,modo,vmax,accel]"
+    mueve el motor y responde DONE; "S" aborta el movimiento en curso (que también
+    responde DONE). La salida sigue al motor con un juego de 'backlash' pasos y la
+    afinación cambia cents_per_step por paso de la salida.
+    realtime=False termina cada movimiento al recibirlo; True usa la duración del perfil.
+    """
+    def __init__(self, cents=0.0, cents_per_step=1.0, backlash=0.0, realtime=False, respond=True):
+        self.is_open = True
+        self.cents0 = cents
+        self.cents_per_step = cents_per_step
+        self.backlash = backlash
+        self.realtime = realtime
+        self.respond = respond
+        self.fail_writes = False
+        self.commands = []
+        self.motor = 0.0              # pasos del motor
+        self.output = 0.0             # pasos de la salida (clavija)
+        self._move = None             # (inicio, signo, ciclos, perfil)
+        self._lines = queue.Queue()
+        self._lock = threading.Lock()
+
+    @property
+    def cents(self):
+        return self.cents0 + self.output * self.cents_per_step
+
+    def _finish(self, now):
+        t0, sign, cycles, profile = self._move
+        self._move = None
+        self.motor += sign * main.move_fraction(now - t0, cycles, profile) * cycles / main.FW_CYCLES_PER_STEP
+        # la salida solo se mueve cuando el motor recorrió el juego
+        if self.motor > self.output + self.backlash:
+            self.output = self.motor - self.backlash
+        elif self.motor < self.output:
+            self.output = self.motor
+        if self.respond:
+            self._lines.put(b"DONE\n")
+
+    def write(self, data):
+        if self.fail_writes:
+            raise OSError("puerto desconectado")
+        cmd = data.decode().strip()
+        self.commands.append(cmd)
+        with self._lock:
+            if cmd == "S":
+                if self._move is not None:
+                    self._finish(time.time())
+                return
+            parts = cmd[1:].split(",")
+            profile = None if len(parts) == 1 else (parts[1], float(parts[2]), float(parts[3]))
+            self._move = (time.time(), 1 if cmd[0] == '+' else -1, int(parts[0]), profile)
+            if not self.realtime:
+                self._finish(float("inf"))
+
+    def readline(self):
+        with self._lock:
+            if self._move is not None:
+                t0, _, cycles, profile = self._move
+                if time.time() - t0 >= main.move_duration(cycles, profile):
+                    self._finish(time.time())
+        try:
+            return self._lines.get(timeout=0.01)
+        except queue.Empty:
+            return b""
+
+    def close(self):
+        self.is_open = False
+
+@pytest.fixture
+def make_motor():
+    motors = []
+    def make(backlash_steps=0.0, **kwargs):
+        ser = FakeSerial(**kwargs)
+        motor = main.MotorController(ser, backlash_steps=backlash_steps)
+        motors.append(motor)
+        return motor, ser
+    yield make
+    for motor in motors:
+        motor.close()
+
+def moves(ser):
+    return [c for c in ser.commands if c != "S"]
+
+def test_learn_backlash_y_pasos_extra_en_reversa(make_motor):
+    motor, ser = make_motor(backlash=4)
+    assert motor.send_move('+', 10)
+    assert motor.learn_backlash(10.0, 1.0) == pytest.approx(10.0)
+    assert motor.backlash_steps == 0.0           # sin cambio de sentido no se aprende
+    before = ser.cents
+    assert motor.send_move('-', 10)
+    assert ser.cents - before == pytest.approx(-6.0)
+    motor.learn_backlash(ser.cents - before, 1.0)
+    assert motor.backlash_steps == pytest.approx(2.0)   # 0 + 0.5*(4 - 0)
+    before = ser.cents
+    assert motor.send_move('+', 10)
+    assert motor.last_move["backlash"] == 2 and motor.last_move["sent"] == 12
+    assert ser.commands[-1] == f"+{12 * main.FW_CYCLES_PER_STEP}"
+    motor.learn_backlash(ser.cents - before, 1.0)
+    assert motor.backlash_steps == pytest.approx(3.0)   # 2 + 0.5*(4 - 2)
+
+def test_position_at_interpola_el_ultimo_movimiento(make_motor):
+    motor, ser = make_motor()
+    t_before = time.time() - 1.0
+    assert motor.send_move('+', 10)
+    assert motor.position == 10
+    assert motor.position_at(t_before) == 0
+    assert motor.position_at(time.time() + 1.0) == 10
+    start, end, _, _ = motor._last_span
+    assert 0 <= motor.position_at((start + end) / 2) <= 10
+
+def test_position_at_durante_el_movimiento(make_motor):
+    motor, ser = make_motor(realtime=True)
+    profile = main.MOVE_PROFILES[1][1:]
+    seen = []
+    def watch():
+        seen.append(motor.position_at())
+        return False
+    assert motor.send_move('-', 10, profile=profile, should_stop=watch)
+    assert motor.position == -10
+    assert seen[0] > seen[-1] >= -10                     # avanza en el sentido del movimiento
+    assert any(-10 < p < 0 for p in seen)
+
+def test_detencion_anticipada_registra_lo_recorrido(make_motor):
+    motor, ser = make_motor(realtime=True, backlash=2)
+    profile = main.MOVE_PROFILES[0][1:]
+    t0 = time.time()
+    assert motor.send_move('+', 30, profile=profile, should_stop=lambda: time.time() - t0 > 0.1)
+    assert "S" in ser.commands
+    assert motor.last_move["done"] and motor.last_move["stopped_early"]
+    assert 0 < motor.position < 30
+    assert motor.position == pytest.approx(ser.motor, abs=1.5)
+    assert motor.last_direction == '+'
+    # una reversa detenida antes no se usa para aprender el juego
+    t0 = time.time()
+    assert motor.send_move('-', 30, profile=profile, should_stop=lambda: time.time() - t0 > 0.1)
+    assert motor.last_move["reversal"] and motor.last_move["stopped_early"]
+    motor.learn_backlash(-1.0, 1.0)
+    assert motor.backlash_steps == 0.0
+
+def test_timeout_detiene_el_motor_y_marca_posicion_desconocida(make_motor):
+    motor, ser = make_motor(respond=False)
+    assert not motor.send_move('+', 1, timeout=0.05)
+    assert ser.commands[-1] == "S"
+    assert motor.last_move is None and motor.last_direction is None
+    assert not motor.position_known
+    assert motor.position == pytest.approx(1.0)          # mejor estimación: lo programado
+    motor.reset_position()
+    assert motor.position_known and motor.position == 0
+
+def test_escritura_fallida_no_cambia_el_estado(make_motor):
+    motor, ser = make_motor()
+    assert motor.send_move('+', 5)
+    ser.fail_writes = True
+    assert not motor.send_move('-', 5)
+    assert motor.last_direction == '+' and motor.last_move["direction"] == '+'
+    assert motor.position == 5 and motor.position_at() == 5
+
+def test_overshoot_en_zona_verde_termina_sin_revertir(make_motor):
+    # -60 cents con 50 pasos de ~1.202 cents: cae en +0.1, al otro lado pero afinada
+    motor, ser = make_motor(cents=-60.0, cents_per_step=60.1 / 50)
+    controller = main.TuningController(motor, lambda: ser.cents, cents_per_step=1.0, max_steps=50)
+    assert controller.run(-60.0) == pytest.approx(0.1)
+    assert moves(ser) == [f"+{50 * main.FW_CYCLES_PER_STEP},F,600,2000"]
+
+def test_reversa_segun_el_overshoot_medido(make_motor):
+    # ganancia real 1.5x la supuesta: -40 -> +20 y la reversa es de 20 pasos, no n/m^2
+    motor, ser = make_motor(cents=-40.0, cents_per_step=1.5)
+    controller = main.TuningController(motor, lambda: ser.cents, cents_per_step=1.0, max_steps=80)
+    controller.run(-40.0)
+    cmds = moves(ser)
+    assert cmds[0].startswith(f"+{40 * main.FW_CYCLES_PER_STEP},")
+    assert cmds[1].startswith(f"-{20 * main.FW_CYCLES_PER_STEP},")
+
+@pytest.mark.parametrize("initial, gain, backlash", [
+    (-60.0, 1.0, 0.0), (-80.0, 2.5, 3.0), (70.0, 0.6, 4.0), (-120.0, 1.8, 2.0), (45.0, 3.0, 1.0),
+])
+def test_controlador_converge(make_motor, initial, gain, backlash):
+    motor, ser = make_motor(cents=initial, cents_per_step=gain, backlash=backlash)
+    controller = main.TuningController(motor, lambda: ser.cents, cents_per_step=1.0, max_steps=50)
+    result = controller.run(initial)
+    assert result == pytest.approx(ser.cents)
+    assert abs(result) <= main.GREEN_CENTS
+
+def test_stopping_steps_sigue_la_velocidad(make_motor):
+    motor, ser = make_motor(realtime=True)
+    assert motor.stopping_steps() == 0.0
+    profile = main.MOVE_PROFILES[0][1:]
+    samples = []
+    def watch():
+        now = time.time()
+        samples.append((motor.stopping_steps(now), motor.position_at(now)))
+        return False
+    assert motor.send_move('+', 40, profile=profile, should_stop=watch)
+    assert motor.stopping_steps() == 0.0
+    minimum = 1.0 / main.FW_CYCLES_PER_STEP
+    assert all(s >= minimum - 1e-9 for s, _ in samples)
+    # a velocidad de crucero se recorre vmax/fases_por_paso * latencia
+    cruise = 600 / 4 / main.FW_CYCLES_PER_STEP * main.STOP_LATENCY_S + minimum
+    assert max(s for s, _ in samples) == pytest.approx(cruise, rel=0.05)
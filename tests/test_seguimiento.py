@@ -0,0 +1,83 @@
+"""
+Pruebas del seguidor de afinación (seguimiento.PitchTracker).
+
+Ejecutar desde la raíz del repositorio: python -m pytest -q
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from seguimiento import PitchTracker   # noqa: E402
+
+DT = 0.2   # un bloque de audio más la pausa de la interfaz, aprox.
+
+def feed(tracker, readings, t=0.0, motor_pos=None, cents_per_step=1.0, confidence=1.0):
+    """Entrega lecturas una por bloque; retorna el instante de la última."""
+    for cents in readings:
+        t += DT
+        tracker.predict(t, motor_pos, cents_per_step)
+        tracker.update(cents, confidence)
+    return t
+
+def test_converge_con_lecturas_ruidosas():
+    rng = np.random.default_rng(0)
+    tracker = PitchTracker()
+    t = feed(tracker, -12.0 + 3.0 * rng.standard_normal(40))
+    est, sd = tracker.estimate()
+    assert est == pytest.approx(-12.0, abs=1.5)
+    assert sd < 3.0
+    assert tracker.last_update == pytest.approx(t)
+
+def test_sigue_el_movimiento_del_motor():
+    tracker = PitchTracker()
+    t = feed(tracker, [-30.0] * 10, motor_pos=0)
+    # el motor avanza 10 pasos de 2 cents y las lecturas lo confirman
+    feed(tracker, [-10.0] * 3, t=t, motor_pos=10, cents_per_step=2.0)
+    est, _ = tracker.estimate()
+    assert est == pytest.approx(-10.0, abs=0.5)
+
+def test_descarta_lectura_fuera_de_la_compuerta():
+    tracker = PitchTracker(max_rejects=3)
+    t = feed(tracker, [5.0] * 10)
+    est, sd = tracker.estimate()
+    tracker.predict(t + DT)
+    assert tracker.update(1200.0) is False          # error de octava
+    assert tracker.estimate()[0] == pytest.approx(est)
+    assert tracker.update(5.5) is True              # una lectura buena reinicia la cuenta
+    assert tracker.update(1200.0) is False
+    assert tracker.update(1200.0) is False
+    assert tracker.estimate()[0] == pytest.approx(5.5, abs=0.5)
+
+def test_reinicia_tras_varios_descartes_seguidos():
+    tracker = PitchTracker(max_rejects=3)
+    t = feed(tracker, [5.0] * 10)
+    t = feed(tracker, [-80.0] * 2, t=t)
+    assert tracker.estimate()[0] == pytest.approx(5.0, abs=0.5)
+    feed(tracker, [-80.0], t=t)                      # otra cuerda: el filtro la adopta
+    est, sd = tracker.estimate()
+    assert est == pytest.approx(-80.0)
+    assert sd == pytest.approx(np.sqrt(tracker.meas_var))
+
+def test_estimate_proyecta_sin_modificar_el_filtro():
+    tracker = PitchTracker()
+    t = feed(tracker, [-20.0] * 10, motor_pos=0)
+    state = (tracker.x, tracker.P, tracker._t, tracker._motor_pos, tracker.last_update)
+    est, sd = tracker.estimate()
+    proj, proj_sd = tracker.estimate(t + 1.0, 5, 2.0)
+    assert proj == pytest.approx(est + 10.0)
+    expected = np.sqrt(sd ** 2 + tracker.drift_var * 1.0 + (tracker.gain_rel_std * 10.0) ** 2)
+    assert proj_sd == pytest.approx(expected)
+    assert (tracker.x, tracker.P, tracker._t, tracker._motor_pos, tracker.last_update) == state
+    assert tracker.estimate() == (est, sd)
+
+def test_sin_lecturas_no_hay_estimacion():
+    tracker = PitchTracker()
+    tracker.predict(1.0, 0)
+    assert tracker.estimate(2.0, 3) == (None, None)
+    assert tracker.update(None) is False
+    feed(tracker, [3.0])
+    tracker.reset()
+    assert tracker.estimate() == (None, None)